@@ -35,7 +35,11 @@ sample_time = 30        # seconds
 # if influxdb server is up and accessible
 # TDB: test connection
 
-client = InfluxDBClient(host='localhost', port=8086, username='root', password='root', database='homeclimate')
+# The collector imports this script as a driver and writes through its own client, so the
+# client is only created when the script runs standalone.
+
+if __name__ == '__main__':
+    client = InfluxDBClient(host='localhost', port=8086, username='root', password='root', database='homeclimate')
 
 
 ####################################################################################################
@@ -103,17 +107,19 @@ def write_database(client, data):
 # Continuously take data
 ####################################################################################################
 
-try:
-    while True:
+if __name__ == '__main__':
+
+    try:
+        while True:
 
-        write_database(client = client,
-                       data   = read_sensor()
-                      )
+            write_database(client = client,
+                           data   = read_sensor()
+                          )
 
-        time.sleep(sample_time)
+            time.sleep(sample_time)
 
-except KeyboardInterrupt:
-    print (datetime.datetime.now(), "  Program stopped by keyboard interrupt [CTRL_C] by user. ")
+    except KeyboardInterrupt:
+        print (datetime.datetime.now(), "  Program stopped by keyboard interrupt [CTRL_C] by user. ")
 
 
 ####################################################################################################
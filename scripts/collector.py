@@ -0,0 +1,178 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Run all sensors in a single process. Each sensor script is loaded as a driver and read from a
+shared loop, all data goes through one influxdb client. This replaces running one service per
+sensor script; those services still work but are optional now.
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import os
+import signal
+import asyncio
+import datetime
+
+from homeclimate_collector.drivers import load_drivers
+from homeclimate_collector.engine import PollingEngine
+from homeclimate_collector.buffer import WriteBuffer
+from homeclimate_collector.transport import connect, UDPSink
+from homeclimate_collector.spool import Spool
+from homeclimate_collector.cache import ReadingsCache
+from homeclimate_collector.metrics import MetricsServer
+from homeclimate_collector.board import Board
+from homeclimate_collector.profiling import Profiler
+
+
+####################################################################################################
+# Collector Definition
+####################################################################################################
+
+sample_time = 30        # seconds, default period of all drivers
+timeout     = 20        # seconds, default deadline for a single read
+max_workers = 4         # threads for drivers with blocking reads
+overrun     = 'skip'    # 'skip' or 'catchup' ticks that were missed because a read overran
+precision   = 's'       # timestamp precision of all written points: 's', 'ms', 'u' or 'n'
+batch_size  = 100       # points, flush the write buffer when it holds this many points
+max_latency = 60        # seconds, flush the write buffer at least this often
+script_dir  = os.path.dirname(os.path.abspath(__file__))
+
+# connection to influxdb, on the Pi itself or on the home server
+influx_host    = 'localhost'
+pool_size      = 2          # kept-alive HTTP connections
+http_timeout   = 10         # seconds
+compress_above = 1000       # bytes, gzip writes of at least this size
+udp_port       = 8089       # UDP listener of influxdb for drivers with 'transport': 'udp'
+
+# writes that fail are spooled to disk and replayed once the database is reachable again
+spool_dir       = '/home/pi/homeclimate/spool/'
+spool_max_bytes = 50000000      # bytes, oldest data is dropped beyond this size
+
+# local cache of recent readings for tools on the Pi, see homeclimate_collector/cache.py
+cache_path      = '/home/pi/homeclimate/cache/readings.sqlite'
+cache_retention = 7             # days
+
+# latest readings in Prometheus format on http://<pi>:metrics_port/metrics
+metrics_port    = 9110
+
+# latest readings for local processes in shared memory, see homeclimate_collector/board.py
+board_path      = '/dev/shm/homeclimate_board'
+
+# on-demand profiling: kill -USR1 (cProfile, tracemalloc) or kill -USR2 (stack sampling) the collector
+profile_dir      = '/home/pi/homeclimate/profiles/'
+profile_duration = 60      # seconds
+
+# TP-Link HS110 smart plugs, all polled concurrently by the hs110 driver
+# Readings are tagged plug=<name>. The plug without name keeps writing to the untagged series of
+# hs110.py; naming it would start a new series and split it from its history in grafana.
+plugs = [{'ip': '0.0.0.0', 'port': 9999},                       # change to IP of your smart plug
+        ]
+
+# windows to summarize fast sampled drivers over, see 'aggregate' below
+# Only drivers with 'aggregate' write hourly summaries to homeclimate_hourly. The statistics scripts
+# also read the hourly means of the other sensors, so the continuous query is still required.
+windows = [{'window': 30,   'database': 'homeclimate'},
+           {'window': 300,  'database': 'homeclimate'},
+           {'window': 3600, 'database': 'homeclimate_hourly'},
+          ]
+
+# change-based reporting: fields are only written when they leave their band or every heartbeat
+heartbeat = 900         # seconds
+deadbands = {'dht22':      {'temperature': {'absolute': 0.1, 'heartbeat': heartbeat},
+                            'humidity':    {'absolute': 0,   'heartbeat': heartbeat},
+                            '*':           {'relative': 0.01, 'heartbeat': heartbeat}},
+             'bmp180':     {'temperature': {'absolute': 0.1, 'heartbeat': heartbeat},
+                            'pressure':    {'absolute': 0,   'heartbeat': heartbeat}},
+             'co2monitor': {'temperature': {'absolute': 0.1, 'heartbeat': heartbeat},
+                            'co2':         {'absolute': 10,  'heartbeat': heartbeat}},
+            }
+
+# adaptive sampling: sample faster while CO2 changes quickly, e.g. after opening a window
+adaptive_co2 = {'min_period': 7.5, 'max_period': 60, 'fields': {'co2': {'rate': 0.5, 'std': 20}}}     # ppm/s, ppm
+
+# sensor scripts to load as drivers
+# Drivers that cannot be loaded, e.g. because the sensor is not attached, are skipped. 'period' and
+# 'timeout' override the defaults above per driver. 'native' replaces the blocking reader by an
+# implementation in the collector, configured by 'options': 'hs110' polls all plugs with asyncio,
+# 'oversample' reads the sensor in the background every 'interval' seconds and writes the median,
+# mean, min and max of each tick. 'aggregate' writes summaries over the given windows instead of
+# every reading. 'deadband' only writes fields whose value changed, see deadbands above. 'adaptive'
+# replaces the fixed period by an adaptive one. 'transport': 'udp' sends the data of the driver to
+# the UDP listener of influxdb without waiting for an acknowledgement, see transport.py.
+drivers = [{'script': 'dht22.py',      'native': 'oversample',   'database': 'homeclimate', 'options': {'interval': 2, 'digits': {'humidity': 0, 'temperature': 2}}, 'deadband': deadbands['dht22']},
+           {'script': 'bmp180.py',     'reader': 'read_sensor',  'database': 'homeclimate', 'deadband': deadbands['bmp180']},
+           {'script': 'tsl2561.py',    'reader': 'read_monitor', 'database': 'homeclimate', 'period': 2, 'aggregate': windows},
+           {'script': 'co2monitor.py', 'reader': 'read_monitor', 'database': 'homeclimate', 'deadband': deadbands['co2monitor'], 'adaptive': adaptive_co2},
+           {'script': 'mh-z19.py',     'reader': 'read_monitor', 'database': 'homeclimate', 'adaptive': adaptive_co2},
+           {'script': 'hs110.py',      'native': 'hs110',        'database': 'telegraf', 'options': {'plugs': plugs}},
+           {'script': 'pi_info.py',    'reader': 'read_sensor',  'database': 'homeclimate'},
+          ]
+
+
+####################################################################################################
+# Initialize connection to influxdb
+####################################################################################################
+
+# if influxdb server is up and accessible
+# TDB: test connection
+
+client = connect(host=influx_host, port=8086, username='root', password='root', database='homeclimate', pool_size=pool_size, timeout=http_timeout)
+spool  = Spool(spool_dir, max_bytes=spool_max_bytes)
+cache  = ReadingsCache(cache_path, retention_days=cache_retention)
+board  = Board(board_path)
+buffer = WriteBuffer(client, 'homeclimate', precision=precision, batch_size=batch_size, max_latency=max_latency, spool=spool, compress_above=compress_above)
+
+
+####################################################################################################
+# Load drivers
+####################################################################################################
+
+udp     = UDPSink(influx_host, udp_port)
+drivers = load_drivers(drivers, script_dir, sinks={'udp': udp.add})
+print(datetime.datetime.now(), "  Loaded drivers: "+', '.join([d.name for d in drivers]))
+
+
+####################################################################################################
+# Continuously take data
+####################################################################################################
+
+engine  = PollingEngine(drivers, buffer.add, period=sample_time, timeout=timeout, max_workers=max_workers, policy=overrun, precision=precision, observers=[cache, board], reporters=[buffer, udp])
+metrics = MetricsServer(engine.errors, port=metrics_port)
+engine.observers.append(metrics)
+profiler = Profiler(profile_dir, duration=profile_duration)
+buffer.start()
+cache.start()
+metrics.start()
+
+async def run():
+    loop = asyncio.get_running_loop()
+    profiler.install(loop)
+    # systemd and shutdown.py stop the collector with SIGTERM, which would otherwise end the
+    # process without writing out the buffer
+    loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    try:
+        await engine.run()
+    except asyncio.CancelledError:
+        print (datetime.datetime.now(), "  Program stopped by SIGTERM. ")
+
+try:
+    asyncio.run(run())
+
+except KeyboardInterrupt:
+    print (datetime.datetime.now(), "  Program stopped by keyboard interrupt [CTRL_C] by user. ")
+
+finally:
+    metrics.stop()
+    buffer.stop()
+    cache.stop()
+    udp.close()
+
+
+####################################################################################################
@@ -36,7 +36,11 @@ sample_time = 30        # seconds
 # if influxdb server is up and accessible
 # TDB: test connection
 
-client = InfluxDBClient(host='localhost', port=8086, username='root', password='root', database='homeclimate')
+# The collector imports this script as a driver and writes through its own client, so the
+# client is only created when the script runs standalone.
+
+if __name__ == '__main__':
+    client = InfluxDBClient(host='localhost', port=8086, username='root', password='root', database='homeclimate')
 
 
 ####################################################################################################
@@ -73,6 +77,26 @@ def read_sensor():
     return data
 
 
+def read_raw():
+    """
+    Single quick reading without retries, used by the collector to oversample the sensor in the
+    background. Humidity is not rounded. Values that cannot be read or are out of range are None.
+    """
+
+    humidity, temperature = dht.read(sensor, pin)
+    if humidity is not None and (humidity<0 or humidity>100):
+        humidity = None
+    if temperature is not None and (temperature<-20 or temperature>40):
+        temperature = None
+
+    data = [{'measurement': 'live logging',
+             'tags': {'room': 'pin'+str(pin), 'sensor': 'DHT22'},
+             'fields': {'temperature': temperature, 'humidity': humidity}
+            }]
+
+    return data
+
+
 ####################################################################################################
 # Send data to influxdb
 ####################################################################################################
@@ -100,17 +124,19 @@ def write_database(client, data):
 # Continuously take data
 ####################################################################################################
 
-try:
-    while True:
+if __name__ == '__main__':
+
+    try:
+        while True:
 
-        write_database(client = client,
-                       data   = read_sensor()
-                      )
+            write_database(client = client,
+                           data   = read_sensor()
+                          )
 
-        time.sleep(sample_time)
+            time.sleep(sample_time)
 
-except KeyboardInterrupt:
-    print (datetime.datetime.now(), "  Program stopped by keyboard interrupt [CTRL_C] by user. ")
+    except KeyboardInterrupt:
+        print (datetime.datetime.now(), "  Program stopped by keyboard interrupt [CTRL_C] by user. ")
 
 
 ####################################################################################################
@@ -0,0 +1,89 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Receive readings from remote sensor nodes over UDP and write them to influxdb through one batched
+write stream. See homeclimate_collector/gateway.py for the format the nodes send. Can run next to
+the collector or on the server itself.
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import signal
+import asyncio
+import datetime
+
+from homeclimate_collector.buffer import WriteBuffer
+from homeclimate_collector.transport import connect
+from homeclimate_collector.spool import Spool
+from homeclimate_collector.gateway import Gateway
+
+
+####################################################################################################
+# Gateway Definition
+####################################################################################################
+
+host        = ''            # listen on all interfaces
+port        = 9120          # UDP port the nodes send to
+precision   = 's'           # timestamp precision of all written points: 's', 'ms', 'u' or 'n'
+max_skew    = 300           # seconds, readings with a time further off are stamped on arrival
+max_series  = 10000         # series, points of further new series are rejected
+batch_size  = 5000          # points, flush the write buffer when it holds this many points
+max_latency = 10            # seconds, flush the write buffer at least this often
+
+# connection to influxdb
+influx_host    = 'localhost'
+pool_size      = 2          # kept-alive HTTP connections
+http_timeout   = 10         # seconds
+compress_above = 1000       # bytes, gzip writes of at least this size
+
+# writes that fail are spooled to disk and replayed once the database is reachable again
+spool_dir       = '/home/pi/homeclimate/spool/gateway/'
+spool_max_bytes = 50000000      # bytes, oldest data is dropped beyond this size
+
+
+####################################################################################################
+# Initialize connection to influxdb
+####################################################################################################
+
+# if influxdb server is up and accessible
+# TDB: test connection
+
+client = connect(host=influx_host, port=8086, username='root', password='root', database='homeclimate', pool_size=pool_size, timeout=http_timeout)
+spool  = Spool(spool_dir, max_bytes=spool_max_bytes)
+buffer = WriteBuffer(client, 'homeclimate', precision=precision, batch_size=batch_size, max_latency=max_latency, spool=spool, compress_above=compress_above)
+
+
+####################################################################################################
+# Continuously receive data
+####################################################################################################
+
+gateway = Gateway(buffer.add, host=host, port=port, precision=precision, max_skew=max_skew, max_series=max_series, reporters=[buffer])
+buffer.start()
+
+async def run():
+    # systemd stops the gateway with SIGTERM, which would otherwise end the process without
+    # writing out the buffer
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    try:
+        await gateway.run()
+    except asyncio.CancelledError:
+        print (datetime.datetime.now(), "  Program stopped by SIGTERM. ")
+
+try:
+    asyncio.run(run())
+
+except KeyboardInterrupt:
+    print (datetime.datetime.now(), "  Program stopped by keyboard interrupt [CTRL_C] by user. ")
+
+finally:
+    buffer.stop()
+
+
+####################################################################################################
@@ -0,0 +1,79 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Micro-benchmark of the TP-Link protocol codec in hs110.py against the original byte-by-byte
+implementation, which is kept here as reference. Run from the scripts directory:
+    python3 -m homeclimate_benchmarks.bench_tplink
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import os
+import json
+import timeit
+from struct import pack
+
+from homeclimate_collector.drivers import load_script
+
+
+####################################################################################################
+# Reference implementation
+####################################################################################################
+
+def encrypt_reference(string):
+    key = 171
+    result = pack('>I', len(string))
+    for i in string:
+        a = key ^ ord(i)
+        key = a
+        result += bytes([a])
+    return result
+
+def decrypt_reference(string):
+    key = 171
+    result = ""
+    for i in string:
+        a = key ^ i
+        key = i
+        result += chr(a)
+    return result
+
+
+####################################################################################################
+# Benchmark
+####################################################################################################
+
+def payload(size):
+    """
+    A get_daystat-like response of roughly the given size.
+    """
+    days = [{'year': 2021, 'month': 1+i//31%12, 'day': 1+i%31, 'energy_wh': i} for i in range(max(1, size//60))]
+    return json.dumps({'emeter': {'get_daystat': {'day_list': days, 'err_code': 0}}})
+
+def bench(hs110, sizes=(100, 2000, 20000, 200000)):
+    print('{:>8} {:>14} {:>14} {:>14} {:>14}'.format('bytes', 'encrypt ref', 'encrypt new', 'decrypt ref', 'decrypt new'))
+    for size in sizes:
+        plain  = payload(size)
+        cipher = hs110.encrypt(plain)
+        assert cipher == encrypt_reference(plain)
+        assert hs110.decrypt(cipher[4:]) == decrypt_reference(cipher[4:]) == plain
+        number = max(1, 200000//size)
+        times  = [timeit.timeit(lambda: f(a), number=number)/number for f,a in [(encrypt_reference, plain),
+                                                                             (hs110.encrypt,     plain),
+                                                                             (decrypt_reference, cipher[4:]),
+                                                                             (hs110.decrypt,     cipher[4:])]]
+        print('{:>8} '.format(len(plain))+' '.join('{:>11.1f} us'.format(t*1e6) for t in times))
+
+
+if __name__ == '__main__':
+    bench(load_script(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'hs110.py')))
+
+
+####################################################################################################
@@ -0,0 +1,237 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Benchmark of the path from reading a sensor to writing its data to influxdb, without hardware and
+without a server. The sensor scripts are loaded with fake sensor libraries and an HS110 stand-in,
+see fakes.py, and write to a local influxdb stand-in, see influx.py. Two paths are measured:
+    scripts     every reading is written on its own by the script's write_database, as the
+                standalone sensor scripts do
+    collector   readings are encoded to line protocol and written in batches by the WriteBuffer,
+                as the collector does
+Each configuration reads all sensors in rounds for the given duration. More sensors than the seven
+scripts are simulated by reading the scripts repeatedly with distinct room tags. The reported latency
+is the time from the start of a reading until its write was acknowledged, so for the collector it
+includes the time the reading waited in the buffer. CPU is the user and system time per 1000 points,
+RSS the peak resident memory of the process so far. Run from the scripts directory:
+    python3 -m homeclimate_benchmarks.bench_write
+    python3 -m homeclimate_benchmarks.bench_write --batch-sizes 1 100 --sensors 7 700 --save base.json
+    python3 -m homeclimate_benchmarks.bench_write --compare base.json
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import os
+import json
+import time
+import argparse
+import resource
+import contextlib
+from influxdb import InfluxDBClient
+
+from homeclimate_benchmarks import fakes
+from homeclimate_benchmarks.influx import InfluxStandIn
+from homeclimate_collector.drivers import load_script
+from homeclimate_collector.buffer import WriteBuffer
+from homeclimate_collector.points import Encoder
+
+
+####################################################################################################
+# Setup
+####################################################################################################
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# sensor scripts and their readers, as configured in collector.py
+readers = [('dht22.py',      'read_sensor'),
+           ('bmp180.py',     'read_sensor'),
+           ('tsl2561.py',    'read_monitor'),
+           ('co2monitor.py', 'read_monitor'),
+           ('mh-z19.py',     'read_monitor'),
+           ('hs110.py',      'read_sensor'),
+           ('pi_info.py',    'read_sensor'),
+          ]
+
+
+def load_sensors(plug_port):
+    """
+    Load all sensor scripts against the fake libraries. Returns a list of (module, reader).
+    """
+    sensors = []
+    for script,reader in readers:
+        module = load_script(os.path.join(script_dir, script))
+        if script == 'hs110.py':
+            module.ip   = '127.0.0.1'
+            module.port = plug_port
+        sensors.append((module, getattr(module, reader)))
+    return sensors
+
+
+def relabel(data, copy):
+    """
+    Distinct series for repeated reads of the same script.
+    """
+    if copy == 0:
+        return data
+    for point in data:
+        point['tags'] = dict(point['tags'], room=point['tags'].get('room', 'none')+' '+str(copy))
+    return data
+
+
+####################################################################################################
+# Statistics
+####################################################################################################
+
+def quantile(values, q):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values)-1, int(q*len(values)))]
+
+
+@contextlib.contextmanager
+def usage(result):
+    """
+    Wall and CPU time of the block, and the peak RSS after it.
+    """
+    start_wall = time.perf_counter()
+    start      = resource.getrusage(resource.RUSAGE_SELF)
+    yield
+    end        = resource.getrusage(resource.RUSAGE_SELF)
+    result['wall'] = time.perf_counter()-start_wall
+    result['cpu']  = (end.ru_utime-start.ru_utime)+(end.ru_stime-start.ru_stime)
+    result['rss']  = end.ru_maxrss/1024         # kB -> MB on Linux
+
+
+####################################################################################################
+# Benchmark
+####################################################################################################
+
+def run_scripts(sensors, count, client, duration):
+    """
+    Read and write every reading on its own, as the sensor scripts do.
+    """
+    latencies = []
+    end       = time.perf_counter()+duration
+    while time.perf_counter() < end:
+        for i in range(count):
+            module,reader = sensors[i % len(sensors)]
+            start = time.perf_counter()
+            module.write_database(client, relabel(reader(), i//len(sensors)))
+            latencies.append(time.perf_counter()-start)
+    return latencies
+
+
+def run_collector(sensors, count, client, duration, batch_size):
+    """
+    Read, encode and write in batches, as the collector does. The buffer is flushed inline so that
+    the acknowledgement of each write can be attributed to the readings it contained.
+    """
+    buffer    = WriteBuffer(client, 'homeclimate', batch_size=batch_size, max_latency=3600)
+    encoders  = {}
+    latencies = []
+    pending   = []
+    end       = time.perf_counter()+duration
+    while time.perf_counter() < end:
+        for i in range(count):
+            module,reader = sensors[i % len(sensors)]
+            start = time.perf_counter()
+            data  = relabel(reader(), i//len(sensors))
+            lines = encoders.setdefault(i, Encoder('s')).encode(data, time.time())
+            pending.append(start)
+            written = buffer.written
+            buffer.add(lines)
+            if buffer.written != written:
+                done       = time.perf_counter()
+                latencies += [done-s for s in pending]
+                pending    = []
+    buffer.flush()
+    done       = time.perf_counter()
+    latencies += [done-s for s in pending]
+    return latencies
+
+
+def bench(path, sensors, count, batch_size, server, client, duration):
+    server.reset()
+    result = {'path': path, 'sensors': count, 'batch_size': batch_size}
+    with contextlib.redirect_stdout(open(os.devnull, 'w')), usage(result):
+        if path == 'scripts':
+            latencies = run_scripts(sensors, count, client, duration)
+        else:
+            latencies = run_collector(sensors, count, client, duration, batch_size)
+    result['points']     = server.points
+    result['requests']   = server.requests
+    result['bytes']      = server.bytes
+    result['rate']       = server.points/result['wall']
+    result['p50']        = quantile(latencies, 0.5)*1e3
+    result['p99']        = quantile(latencies, 0.99)*1e3
+    result['cpu_per_1k'] = result['cpu']/max(1, server.points)*1e3
+    return result
+
+
+def key(result):
+    return (result['path'], result['sensors'], result['batch_size'])
+
+
+def report(results, baseline=None):
+    baseline = {key(r): r for r in (baseline or [])}
+    print('{:>9} {:>7} {:>6} {:>10} {:>9} {:>9} {:>10} {:>8} {:>8}'.format(
+          'path', 'sensors', 'batch', 'points/s', 'p50 ms', 'p99 ms', 'cpu s/1k', 'rss MB', 'vs base'))
+    for result in results:
+        change = ''
+        if key(result) in baseline:
+            change = '{:+.0%}'.format(result['rate']/baseline[key(result)]['rate']-1)
+        print('{:>9} {:>7} {:>6} {:>10.0f} {:>9.2f} {:>9.2f} {:>10.3f} {:>8.1f} {:>8}'.format(
+              result['path'], result['sensors'], result['batch_size'], result['rate'], result['p50'],
+              result['p99'], result['cpu_per_1k'], result['rss'], change))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the write path with simulated sensors and a local influxdb stand-in.')
+    parser.add_argument('--paths',        nargs='+', default=['scripts', 'collector'], choices=['scripts', 'collector'])
+    parser.add_argument('--batch-sizes',  nargs='+', type=int, default=[1, 10, 100, 1000], help='batch sizes of the collector path')
+    parser.add_argument('--sensors',      nargs='+', type=int, default=[7, 70, 700], help='number of simulated sensors')
+    parser.add_argument('--duration',     type=float, default=3, help='seconds per configuration')
+    parser.add_argument('--sensor-delay', type=float, default=0, help='seconds added to every sensor access')
+    parser.add_argument('--server-delay', type=float, default=0, help='seconds added to every request to the server')
+    parser.add_argument('--save',         help='write the results to this json file')
+    parser.add_argument('--compare',      help='compare the points/s with the results in this json file')
+    args = parser.parse_args()
+
+    fakes.install(delay=args.sensor_delay)
+    server = InfluxStandIn(delay=args.server_delay)
+    plug   = fakes.PlugServer(load_script(os.path.join(script_dir, 'hs110.py')), delay=args.sensor_delay)
+    server.start()
+    plug.start()
+    client  = InfluxDBClient(host='127.0.0.1', port=server.port, database='homeclimate')
+    sensors = load_sensors(plug.port)
+
+    results = []
+    for count in args.sensors:
+        for path in args.paths:
+            for batch_size in (args.batch_sizes if path == 'collector' else [1]):
+                results.append(bench(path, sensors, count, batch_size, server, client, args.duration))
+    plug.stop()
+    server.stop()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
+
+
+####################################################################################################
@@ -0,0 +1,242 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Simulated sensors for benchmarks. install() puts fake versions of the sensor libraries into
+sys.modules, so that the sensor scripts can be imported and read without hardware:
+    Adafruit_DHT, Adafruit_BMP.BMP085, board, busio, adafruit_tsl2561, co2meter, mh_z19, psutil
+PlugServer is a local TCP server that answers HS110 requests like a plug. Readings drift randomly
+around plausible values. 'delay' adds the given seconds to every sensor access to mimic slow buses.
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import sys
+import json
+import time
+import types
+import random
+import struct
+import datetime
+import threading
+import collections
+import socketserver
+
+
+####################################################################################################
+# Signals
+####################################################################################################
+
+class Signal:
+    """
+    Random walk around a mean, kept within the given limits.
+    """
+
+    def __init__(self, mean, step, lower, upper):
+        self.value = mean
+        self.step  = step
+        self.lower = lower
+        self.upper = upper
+
+    def __call__(self):
+        self.value = min(self.upper, max(self.lower, self.value+random.gauss(0, self.step)))
+        return self.value
+
+
+def sleep(delay):
+    if delay > 0:
+        time.sleep(delay)
+
+
+####################################################################################################
+# Fake sensor libraries
+####################################################################################################
+
+def fake_dht(delay):
+    temperature = Signal(21, 0.05, 15, 30)
+    humidity    = Signal(45, 0.2, 20, 80)
+
+    def read(sensor, pin):
+        sleep(delay)
+        return humidity(), temperature()
+
+    module = types.ModuleType('Adafruit_DHT')
+    module.DHT22      = 22
+    module.read       = read
+    module.read_retry = read
+    return {'Adafruit_DHT': module}
+
+
+def fake_bmp(delay):
+    temperature = Signal(12, 0.05, -10, 30)
+    pressure    = Signal(101300, 5, 98000, 104000)
+
+    class BMP085:
+        def read_temperature(self):
+            sleep(delay)
+            return temperature()
+        def read_pressure(self):
+            sleep(delay)
+            return pressure()
+
+    package = types.ModuleType('Adafruit_BMP')
+    module  = types.ModuleType('Adafruit_BMP.BMP085')
+    module.BMP085  = BMP085
+    package.BMP085 = module
+    return {'Adafruit_BMP': package, 'Adafruit_BMP.BMP085': module}
+
+
+def fake_tsl(delay):
+    lux = Signal(300, 10, 0, 2000)
+
+    class TSL2561:
+        def __init__(self, i2c):
+            pass
+        @property
+        def lux(self):
+            sleep(delay)
+            return lux()
+        @property
+        def broadband(self):
+            return int(lux.value*4)
+        @property
+        def infrared(self):
+            return int(lux.value)
+
+    board = types.ModuleType('board')
+    board.SCL = 3
+    board.SDA = 2
+    busio = types.ModuleType('busio')
+    busio.I2C = lambda scl, sda: None
+    tsl   = types.ModuleType('adafruit_tsl2561')
+    tsl.TSL2561 = TSL2561
+    return {'board': board, 'busio': busio, 'adafruit_tsl2561': tsl}
+
+
+def fake_co2meter(delay):
+    co2         = Signal(800, 5, 400, 3000)
+    temperature = Signal(22, 0.05, 15, 30)
+
+    class CO2monitor:
+        def read_data(self):
+            sleep(delay)
+            return datetime.datetime.now(), int(co2()), round(temperature(), 2)
+
+    module = types.ModuleType('co2meter')
+    module.CO2monitor = CO2monitor
+    return {'co2meter': module}
+
+
+def fake_mh_z19(delay):
+    co2         = Signal(700, 5, 400, 3000)
+    temperature = Signal(20, 0.05, 15, 30)
+
+    def read_all():
+        sleep(delay)
+        return {'co2': int(co2()), 'temperature': int(temperature()), 'TT': 60, 'SS': 0, 'UhUl': 0}
+
+    module = types.ModuleType('mh_z19')
+    module.read_all = read_all
+    return {'mh_z19': module}
+
+
+def fake_psutil(delay):
+    load        = Signal(20, 2, 1, 100)
+    temperature = Signal(50, 0.5, 30, 80)
+    Memory      = collections.namedtuple('Memory', ['percent', 'used'])
+    Thermal     = collections.namedtuple('Thermal', ['current'])
+
+    module = types.ModuleType('psutil')
+    module.cpu_percent          = lambda: load()
+    module.cpu_freq             = lambda: (1.2, 0.6, 1.2)
+    module.sensors_temperatures = lambda: {'cpu-thermal': [Thermal(temperature())]}
+    module.virtual_memory       = lambda: Memory(40.0, 400000000)
+    return {'psutil': module}
+
+
+def install(delay=0):
+    """
+    Replace the sensor libraries by fakes. Must be called before the sensor scripts are imported.
+    """
+    for fake in [fake_dht, fake_bmp, fake_tsl, fake_co2meter, fake_mh_z19, fake_psutil]:
+        sys.modules.update(fake(delay))
+
+
+####################################################################################################
+# Fake HS110 smart plug
+####################################################################################################
+
+class PlugHandler(socketserver.BaseRequestHandler):
+    """
+    Answers a single framed request per connection, like the plug does.
+    """
+
+    def handle(self):
+        hs110 = self.server.hs110
+        try:
+            header  = self.recv_exactly(4)
+            request = json.loads(hs110.decrypt(self.recv_exactly(struct.unpack('>I', header)[0])))
+        except (ConnectionError, ValueError):
+            return
+        sleep(self.server.delay)
+        self.request.sendall(hs110.encrypt(json.dumps(self.server.respond(request))))
+
+    def recv_exactly(self, size):
+        data = b''
+        while len(data) < size:
+            chunk = self.request.recv(size-len(data))
+            if not chunk:
+                raise ConnectionError('connection closed')
+            data += chunk
+        return data
+
+
+class PlugServer(socketserver.ThreadingTCPServer):
+    """
+    Local stand-in for an HS110 on a free port. hs110 is the loaded hs110.py script, whose codec is
+    used for the replies.
+    """
+
+    daemon_threads      = True
+    allow_reuse_address = True
+
+    def __init__(self, hs110, host='127.0.0.1', port=0, delay=0):
+        super().__init__((host, port), PlugHandler)
+        self.hs110  = hs110
+        self.delay  = delay
+        self.power  = Signal(60000, 500, 0, 2000000)
+        self.energy = 1000
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def respond(self, request):
+        reply = {}
+        if 'emeter' in request:
+            power        = int(self.power())
+            self.energy += 1
+            reply['emeter'] = {'get_realtime': {'voltage_mv': 230000, 'current_ma': power//230, 'power_mw': power,
+                                                'total_wh': self.energy, 'err_code': 0}}
+        if 'system' in request:
+            reply['system'] = {'get_sysinfo': {'alias': 'benchmark', 'relay_state': 1, 'rssi': -50, 'on_time': 1000,
+                                               'err_code': 0}}
+        return reply
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name='plug', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+####################################################################################################
@@ -0,0 +1,230 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Load test of the collector with a simulated V2 fleet of ESP32 sensor nodes. Every virtual node is a
+driver of the polling engine that reports temperature, humidity, pressure and radio signal strength,
+every fourth node also CO2, tagged with room and sensor like the existing scripts. The signals follow
+a daily cycle per room with noise, weather-like pressure drifts and CO2 that builds up while a room
+is in use. 'speed' compresses time so that a short run covers more of the daily cycle.
+The fleet is grown in steps. Each step runs the real polling engine and write buffer against the
+local influxdb stand-in for the given duration and reports the offered and achieved points/s, the
+lag from tick to buffered point, the write latency (both in ms), missed ticks and skipped reads,
+CPU load and peak RSS. A step is marked as saturated when less than 95 % of the points of the ticks
+that passed arrive, ticks are missed or skipped or the p99 lag exceeds the period; the run stops
+after the first saturated step. Run from the scripts directory:
+    python3 -m homeclimate_benchmarks.fleet
+    python3 -m homeclimate_benchmarks.fleet --nodes 1000 5000 20000 --period 10 --duration 30
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import os
+import math
+import time
+import random
+import asyncio
+import argparse
+import resource
+import contextlib
+from influxdb import InfluxDBClient
+
+from homeclimate_benchmarks.influx import InfluxStandIn
+from homeclimate_collector.engine import PollingEngine
+from homeclimate_collector.buffer import WriteBuffer
+from homeclimate_collector.instrument import Histogram
+
+
+####################################################################################################
+# Virtual nodes
+####################################################################################################
+
+rooms = ['living room', 'bed room', 'kitchen', 'bath room', 'office', 'hallway', 'guest room',
+         'basement', 'attic', 'garage', 'outdoor']
+
+day = 86400
+
+
+class Node:
+    """
+    Signals of a single ESP32 node. All signals are functions of the simulated time, so nodes do not
+    need to be updated between readings.
+    """
+
+    def __init__(self, index, speed=1):
+        self.index  = index
+        self.speed  = speed
+        self.start  = time.time()
+        self.room   = rooms[index % len(rooms)]
+        self.tags   = {'room': self.room+' '+str(index//len(rooms)), 'sensor': 'ESP32 '+str(index).zfill(5)}
+        self.base   = random.uniform(-2, 8) if self.room in ('outdoor', 'garage') else random.uniform(19, 23)
+        self.swing  = 6 if self.room == 'outdoor' else random.uniform(0.5, 2)
+        self.phase  = random.uniform(-1, 1)*3600
+        self.offset = random.gauss(0, 0.5)
+        self.co2    = index % 4 == 0
+        self.rssi   = random.randint(-85, -45)
+
+    def now(self):
+        return self.start+(time.time()-self.start)*self.speed
+
+    def reading(self):
+        t           = self.now()
+        hour        = (t+self.phase) % day/3600
+        daily       = math.sin(2*math.pi*(hour-9)/24)           # warmest at 15:00
+        temperature = self.base+self.swing*daily+random.gauss(0, 0.05)
+        humidity    = min(100, max(0, 50-2*(temperature-self.base)+self.offset*4+random.gauss(0, 0.5)))
+        pressure    = 1013+8*math.sin(2*math.pi*t/(5*day))+self.offset+random.gauss(0, 0.05)
+        fields      = {'temperature': round(temperature, 2),
+                       'humidity':    round(humidity, 1),
+                       'pressure':    round(pressure, 2),
+                       'rssi':        self.rssi+random.randint(-3, 3)
+                      }
+        if self.co2:
+            # occupied in the morning and in the evening
+            occupied      = max(0, math.sin(2*math.pi*(hour-4)/12))
+            fields['co2'] = int(420+900*occupied+random.gauss(0, 15))
+        return [{'measurement': 'live logging', 'tags': self.tags, 'fields': fields}]
+
+
+class NodeDriver:
+    """
+    Driver of the polling engine for a virtual node. 'latency' is the mean delay of a reading in
+    seconds, e.g. for a node that is queried over the network.
+    """
+
+    is_async = True
+
+    def __init__(self, node, period, latency=0, stages=()):
+        self.node     = node
+        self.name     = 'node'+str(node.index)
+        self.database = None
+        self.period   = period
+        self.timeout  = None
+        self.latency  = latency
+        self.stages   = list(stages)
+
+    async def read(self):
+        if self.latency > 0:
+            await asyncio.sleep(random.expovariate(1/self.latency))
+        return self.node.reading()
+
+
+class LagProbe:
+    """
+    Processing stage that passes everything on and records how late the data of a tick is.
+    """
+
+    def __init__(self):
+        self.lag = Histogram()
+
+    def process(self, batches):
+        now = time.time()
+        for data, seconds, database in batches:
+            self.lag.record(now-seconds)
+        return batches
+
+
+####################################################################################################
+# Load steps
+####################################################################################################
+
+async def run_engine(engine, duration):
+    """
+    Run the engine for the given time. Before Python 3.12 wait_for swallows a cancellation that
+    arrives just as the read finishes, which with thousands of drivers happens to some of them, so
+    the drivers are cancelled until all have stopped.
+    """
+    run = asyncio.ensure_future(engine.run())
+    await asyncio.sleep(duration)
+    tasks = asyncio.all_tasks()-{asyncio.current_task()}
+    while tasks:
+        for task in tasks:
+            task.cancel()
+        await asyncio.sleep(0.1)
+        tasks = {task for task in tasks if not task.done()}
+    with contextlib.suppress(asyncio.CancelledError):
+        run.result()
+
+
+def step(count, args, server, client):
+    """
+    Run a fleet of the given size and measure the collector.
+    """
+    probe   = LagProbe()
+    nodes   = [NodeDriver(Node(i, args.speed), args.period, args.latency, [probe]) for i in range(count)]
+    buffer  = WriteBuffer(client, 'homeclimate', batch_size=args.batch_size, max_latency=args.max_latency)
+    engine  = PollingEngine(nodes, buffer.add, period=args.period, timeout=args.period, stats_period=day)
+    server.reset()
+    buffer.start()
+    start_wall = time.time()
+    start      = resource.getrusage(resource.RUSAGE_SELF)
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        asyncio.run(run_engine(engine, args.duration))
+        end_wall = time.time()
+        buffer.stop()
+    end        = resource.getrusage(resource.RUSAGE_SELF)
+    wall       = end_wall-start_wall
+    cpu        = (end.ru_utime-start.ru_utime)+(end.ru_stime-start.ru_stime)
+    ticks      = math.floor(end_wall/args.period)-math.floor(start_wall/args.period)
+    missed     = sum(schedule.missed for schedule in engine.schedules.values())+sum(engine.busy_skips.values())
+    offered    = count/args.period
+    achieved   = server.points/wall
+    saturated  = server.points < 0.95*count*ticks or missed > 0 or probe.lag.quantile(0.99) > args.period
+    return {'nodes':     count,
+            'offered':   offered,
+            'achieved':  achieved,
+            'lag_p50':   probe.lag.quantile(0.5)*1e3,
+            'lag_p99':   probe.lag.quantile(0.99)*1e3,
+            'write_p50': buffer.latency.quantile(0.5)*1e3,
+            'write_p99': buffer.latency.quantile(0.99)*1e3,
+            'missed':    missed,
+            'cpu':       cpu/wall,
+            'rss':       end.ru_maxrss/1024,
+            'saturated': saturated
+           }
+
+
+def report(result):
+    print('{:>7} {:>10.0f} {:>10.0f} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.1f} {:>7} {:>5.0%} {:>7.1f} {:>4}'.format(
+          result['nodes'], result['offered'], result['achieved'], result['lag_p50'], result['lag_p99'],
+          result['write_p50'], result['write_p99'], result['missed'], result['cpu'], result['rss'],
+          'SAT' if result['saturated'] else ''), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the collector with a simulated fleet of ESP32 sensor nodes.')
+    parser.add_argument('--nodes',        nargs='+', type=int, default=[100, 500, 1000, 2000, 5000, 10000], help='fleet sizes to step through')
+    parser.add_argument('--period',       type=float, default=5, help='seconds between readings of a node')
+    parser.add_argument('--duration',     type=float, default=20, help='seconds per step')
+    parser.add_argument('--latency',      type=float, default=0, help='mean seconds a node takes to answer')
+    parser.add_argument('--speed',        type=float, default=1, help='simulated seconds per second')
+    parser.add_argument('--batch-size',   type=int, default=5000, help='batch size of the write buffer')
+    parser.add_argument('--max-latency',  type=float, default=1, help='max latency of the write buffer in seconds')
+    parser.add_argument('--server-delay', type=float, default=0, help='seconds added to every request to the server')
+    parser.add_argument('--keep-going',   action='store_true', help='continue after the first saturated step')
+    args = parser.parse_args()
+
+    server = InfluxStandIn(delay=args.server_delay)
+    server.start()
+    client = InfluxDBClient(host='127.0.0.1', port=server.port, database='homeclimate')
+    print('{:>7} {:>10} {:>10} {:>9} {:>9} {:>9} {:>9} {:>7} {:>5} {:>7}'.format(
+          'nodes', 'offered/s', 'points/s', 'lag p50', 'lag p99', 'write p50', 'write p99', 'missed', 'cpu', 'rss MB'))
+    for count in args.nodes:
+        result = step(count, args, server, client)
+        report(result)
+        if result['saturated'] and not args.keep_going:
+            break
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
+
+
+####################################################################################################
@@ -0,0 +1,119 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Local stand-in for the influxdb HTTP API, used by benchmarks instead of a real server. It accepts
+writes to /write and counts their requests, points and bytes without parsing or storing the data,
+answers /query with empty results and /ping with 204. 'delay' adds the given seconds to every
+request to mimic a slower server or network.
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import json
+import gzip
+import time
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+####################################################################################################
+# Server
+####################################################################################################
+
+class InfluxHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def body(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return body
+
+    def reply(self, code, content=b''):
+        if self.server.delay > 0:
+            time.sleep(self.server.delay)
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        path = urllib.parse.urlparse(self.path).path
+        if path == '/ping':
+            self.reply(204)
+        elif path == '/query':
+            self.query()
+        else:
+            self.reply(404)
+
+    def do_POST(self):
+        path = urllib.parse.urlparse(self.path).path
+        if path == '/write':
+            self.write()
+        elif path == '/query':
+            self.body()
+            self.query()
+        else:
+            self.reply(404)
+
+    def write(self):
+        wire = int(self.headers.get('Content-Length', 0))
+        body = self.body()
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.points   += body.count(b'\n') + (0 if body.endswith(b'\n') or not body else 1)
+            self.server.bytes    += wire
+        self.reply(204)
+
+    def query(self):
+        self.reply(200, json.dumps({'results': [{'statement_id': 0}]}).encode())
+
+
+class InfluxStandIn(ThreadingHTTPServer):
+    """
+    Threaded HTTP server on a free local port. 'requests', 'points' and 'bytes' count the received
+    writes, 'bytes' as sent over the wire.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, delay=0):
+        super().__init__((host, port), InfluxHandler)
+        self.delay  = delay
+        self.lock   = threading.Lock()
+        self.thread = None
+        self.reset()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.points   = 0
+            self.bytes    = 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name='influxdb', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+####################################################################################################
@@ -0,0 +1,95 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Adaptive sampling period. A driver is sampled faster while its signal changes quickly, e.g. CO2
+after opening a window, and slower while it is stable, e.g. temperature over night. The period is
+halved as soon as the rate of change or the standard deviation of the recent values of a watched
+field exceeds its threshold, and doubled after a number of calm readings in a row. Periods are
+always min_period times a power of two, so that ticks stay aligned to the wall clock. A max_period
+that is not on this grid is lowered to the longest period that is.
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import datetime
+import statistics
+from collections import deque
+
+
+####################################################################################################
+# Adaptive period
+####################################################################################################
+
+class AdaptivePeriod:
+    """
+    Sampling period of a driver between min_period and max_period. fields maps the watched field
+    names to dicts with the thresholds 'rate' (units per second) and/or 'std' (standard deviation
+    of the last history values). The period is doubled after calm readings in which all watched
+    fields stayed below half of their thresholds.
+    """
+
+    def __init__(self, min_period, max_period, fields, history=8, calm=4):
+        longest = min_period
+        while longest*2 <= max_period:
+            longest *= 2
+        if longest != max_period:
+            print(datetime.datetime.now(), "  max_period of "+str(max_period)+" s is not min_period times a power of two. Using "+str(longest)+" s.")
+        self.min_period = min_period
+        self.max_period = longest
+        self.fields     = fields
+        self.calm       = calm
+        self.calm_count = 0
+        self.period     = longest
+        self.values     = {field: deque(maxlen=history) for field in fields}
+
+    def activity(self, field, value, seconds):
+        """
+        Largest ratio of rate of change or standard deviation to its threshold.
+        """
+        thresholds = self.fields[field]
+        values     = self.values[field]
+        ratio      = 0
+        if values and 'rate' in thresholds and seconds > values[-1][0]:
+            rate  = abs(value-values[-1][1])/(seconds-values[-1][0])
+            ratio = max(ratio, rate/thresholds['rate'])
+        values.append((seconds, value))
+        if len(values) >= 3 and 'std' in thresholds:
+            ratio = max(ratio, statistics.stdev(v for t,v in values)/thresholds['std'])
+        return ratio
+
+    def update(self, data, seconds, name=''):
+        """
+        Feed the points of a reading and return the period until the next one.
+        """
+        ratio = 0
+        for point in data:
+            for field,value in point['fields'].items():
+                if field in self.fields and value is not None:
+                    ratio = max(ratio, self.activity(field, value, seconds))
+
+        period = self.period
+        if ratio > 1:
+            self.calm_count = 0
+            period = max(self.min_period, self.period/2)
+        elif ratio < 0.5:
+            self.calm_count += 1
+            if self.calm_count >= self.calm:
+                self.calm_count = 0
+                period = min(self.max_period, self.period*2)
+        else:
+            self.calm_count = 0
+
+        if period != self.period:
+            print(datetime.datetime.now(), "  Sampling period of "+name+" changed from "+str(self.period)+" s to "+str(period)+" s.")
+            self.period = period
+        return self.period
+
+
+####################################################################################################
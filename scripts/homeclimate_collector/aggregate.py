@@ -0,0 +1,110 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Aggregate readings on the Pi instead of writing every sample. A driver can be sampled fast, e.g.
+every 2 seconds, and only summaries over fixed windows are written: mean, min, max, last value and
+number of values of every field. Fields are named like the output of an influxdb continuous query
+(mean_co2, max_co2, ...), so a one hour window written to homeclimate_hourly stands in for the
+continuous query for that driver. Drivers that are not aggregated still need the continuous query.
+Windows are aligned to the epoch, a summary is stamped with the start of its window and tagged with
+the window length. It is written when the first reading of the next window arrives.
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import math
+
+
+####################################################################################################
+# Window aggregation
+####################################################################################################
+
+def duration(seconds):
+    """
+    Format a window length like an influxdb duration, e.g. 30s, 5m, 1h.
+    """
+    for unit,length in [('d', 86400), ('h', 3600), ('m', 60)]:
+        if seconds % length == 0:
+            return str(seconds//length)+unit
+    return str(seconds)+'s'
+
+
+class Window:
+    """
+    Running summaries of all series of a driver over one window length.
+    """
+
+    def __init__(self, window, database=None):
+        self.window   = window
+        self.database = database
+        self.tag      = duration(window)
+        self.series   = {}
+
+    def summary(self, measurement, tags, fields):
+        summary = {}
+        for field,(total, low, high, last, count) in fields.items():
+            summary.update({'mean_'+field:  float(total/count),
+                            'min_'+field:   low,
+                            'max_'+field:   high,
+                            'last_'+field:  last,
+                            'count_'+field: count
+                           })
+        return {'measurement': measurement, 'tags': dict(tags, window=self.tag), 'fields': summary}
+
+    def add(self, data, seconds):
+        """
+        Add the points of a reading. Returns (data, start of window) for every window that was
+        completed by this reading.
+        """
+        start     = math.floor(seconds/self.window)*self.window
+        completed = {}
+        for point in data:
+            key = (point['measurement'], tuple(sorted(point['tags'].items())))
+            state = self.series.get(key)
+            if state is not None and state[0] != start:
+                if state[1]:
+                    completed.setdefault(state[0], []).append(self.summary(key[0], key[1], state[1]))
+                state = None
+            if state is None:
+                state = self.series[key] = [start, {}]
+            for field,value in point['fields'].items():
+                if value is None or isinstance(value, (str, bool)):
+                    continue
+                current = state[1].get(field)
+                if current is None:
+                    state[1][field] = [value, value, value, value, 1]
+                else:
+                    current[0] += value
+                    current[1]  = min(current[1], value)
+                    current[2]  = max(current[2], value)
+                    current[3]  = value
+                    current[4] += 1
+        return [(summaries, start) for start,summaries in completed.items()]
+
+
+class Aggregator:
+    """
+    Pipeline stage that replaces the readings of a driver by summaries over one or more windows,
+    given as list of dicts with keys 'window' (seconds) and optionally 'database'.
+    """
+
+    def __init__(self, windows):
+        self.windows = [Window(w['window'], w.get('database')) for w in windows]
+
+    def process(self, batches):
+        output = []
+        for data, seconds, database in batches:
+            for window in self.windows:
+                for summaries, start in window.add(data, seconds):
+                    output.append((summaries, start, window.database or database))
+        return output
+
+
+####################################################################################################
@@ -0,0 +1,166 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Shared-memory board of the latest readings. The collector publishes the latest value of every field
+into a memory-mapped file of fixed layout in /dev/shm. Any process on the Pi, e.g. a display or an
+ad-hoc script, can read all current values from it without network, database or system calls:
+    from homeclimate_collector.board import BoardReader
+    board = BoardReader()
+    board.read()        # {(series, field): (value, time), ...}
+
+Layout (little endian):
+    header   magic 'HCB1', number of slots (uint32), used slots (uint32), padding, sequence (uint64)
+    slots    name (120 bytes utf-8, series and field separated by a tab), value (float64),
+             time (float64); fields with longer names are not published
+The sequence works as a seqlock: the writer makes it odd before changing the board and even again
+afterwards. A reader copies the board between two reads of the sequence and retries if the
+sequence was odd or changed in between.
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import os
+import time
+import mmap
+import struct
+import datetime
+
+from homeclimate_collector.points import series_name
+
+
+####################################################################################################
+# Layout
+####################################################################################################
+
+default_path = '/dev/shm/homeclimate_board'
+magic        = b'HCB1'
+header       = struct.Struct('<4sIIIQ')         # magic, slots, used, padding, sequence
+sequence     = struct.Struct('<Q')
+sequence_at  = 16
+slot         = struct.Struct('<120sdd')         # name, value, time
+name_size    = 120
+
+
+####################################################################################################
+# Writer
+####################################################################################################
+
+class Board:
+    """
+    Writer side of the board, used by the collector as observer of the polling engine.
+    """
+
+    def __init__(self, path=default_path, slots=256):
+        self.slots = slots
+        self.index = {}
+        size       = header.size+slots*slot.size
+        fd         = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            self.map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self.map[:] = bytes(size)
+        header.pack_into(self.map, 0, magic, slots, 0, 0, 0)
+        self.sequence = 0
+        self.too_long = set()
+
+    def observe(self, name, data, seconds):
+        """
+        Publish all numeric fields of a reading in one update of the board.
+        """
+        values = []
+        for point in data:
+            series = series_name(point)
+            for field,value in point['fields'].items():
+                if isinstance(value, (int, float)):
+                    values.append(((series+'\t'+field).encode('utf-8'), float(value)))
+        if not values:
+            return
+        self.sequence += 1
+        sequence.pack_into(self.map, sequence_at, self.sequence)
+        for key,value in values:
+            position = self.index.get(key)
+            if position is None:
+                if len(self.index) >= self.slots:
+                    continue
+                if len(key) > name_size:
+                    # cutting the name could split a character or drop the field, so it is left out
+                    if key not in self.too_long:
+                        self.too_long.add(key)
+                        print(datetime.datetime.now(), "  Name "+key.decode('utf-8')+" is too long for the board. Leaving it out.")
+                    continue
+                position = self.index[key] = header.size+len(self.index)*slot.size
+                struct.pack_into('<I', self.map, 8, len(self.index))
+            slot.pack_into(self.map, position, key, value, seconds)
+        self.sequence += 1
+        sequence.pack_into(self.map, sequence_at, self.sequence)
+
+    def close(self):
+        self.map.close()
+
+
+####################################################################################################
+# Reader
+####################################################################################################
+
+class BoardReader:
+    """
+    Reader side of the board. The file is mapped once, reads are plain memory accesses.
+    """
+
+    def __init__(self, path=default_path):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:4] != magic:
+            raise ValueError(path+" is not a homeclimate board.")
+
+    def snapshot(self, timeout=1):
+        """
+        Consistent copy of the used part of the board. Between retries the reader yields, because
+        the writer may be holding its update open while it waits for the GIL or the CPU.
+        """
+        deadline = time.monotonic()+timeout
+        tries    = 0
+        while True:
+            before = sequence.unpack_from(self.map, sequence_at)[0]
+            if not before % 2:
+                used = struct.unpack_from('<I', self.map, 8)[0]
+                data = self.map[header.size:header.size+used*slot.size]
+                if sequence.unpack_from(self.map, sequence_at)[0] == before:
+                    return used, data
+            if time.monotonic() > deadline:
+                raise RuntimeError("Board is changing too fast to be read consistently.")
+            tries += 1
+            time.sleep(0 if tries < 10 else 0.0001)
+
+    def read(self):
+        """
+        All current values as {(series, field): (value, time)}.
+        """
+        used, data = self.snapshot()
+        values = {}
+        for name,value,seconds in slot.iter_unpack(data):
+            series, tab, field = name.rstrip(b'\0').decode('utf-8', errors='replace').partition('\t')
+            if tab:
+                values[(series, field)] = (value, seconds)
+        return values
+
+    def get(self, series, field):
+        """
+        Current (value, time) of a single field, or None.
+        """
+        return self.read().get((series, field))
+
+    def close(self):
+        self.map.close()
+
+
+####################################################################################################
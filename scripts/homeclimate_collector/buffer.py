@@ -0,0 +1,186 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Collect encoded points from all drivers and write them to influxdb in bulk. The buffer is flushed
+when it holds batch_size points or when the oldest point is older than max_latency seconds,
+whichever comes first. Writes of at least compress_above bytes are gzip compressed. Batches that
+fail to be written go to the spool, if one is given, and are replayed after the next successful
+write. If the spool cannot take a batch either, e.g. because the disk is full, the batch is dropped.
+The buffer reports the latency of its writes and counters of written points, failed writes, spooled
+batches and dropped points as the 'collector' measurement with the tag component=write.
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import time
+import datetime
+import threading
+
+from homeclimate_collector.database import write_lines
+from homeclimate_collector.instrument import Histogram
+
+
+####################################################################################################
+# Write buffer
+####################################################################################################
+
+class WriteBuffer:
+    """
+    Buffer line protocol points per database and flush them with a single write per database.
+    Points added without a database go to the given default database. All points must be encoded
+    in the same precision.
+    """
+
+    def __init__(self, client, database, precision='s', batch_size=100, max_latency=60, spool=None, compress_above=None):
+        self.client         = client
+        self.database       = database
+        self.precision      = precision
+        self.compress_above = compress_above
+        self.spool          = spool
+        self.batch_size     = batch_size
+        self.max_latency    = max_latency
+        self.batches        = {}
+        self.count          = 0
+        self.oldest         = None
+        self.lock           = threading.Lock()
+        self.flush_lock     = threading.Lock()
+        self.stopped        = threading.Event()
+        self.wakeup         = threading.Event()
+        self.thread         = None
+        self.latency        = Histogram()
+        self.written        = 0
+        self.failures       = 0
+        self.spooled        = 0
+        self.replays        = 0
+        self.dropped        = 0
+
+    def add(self, data, database=None):
+        """
+        Add a list of encoded points destined for the given database. A full buffer is flushed right away,
+        by the background thread if it is running so that the caller does not wait for the write.
+        """
+        if not data:
+            return
+        with self.lock:
+            self.batches.setdefault(database or self.database, []).extend(data)
+            self.count += len(data)
+            if self.oldest is None:
+                self.oldest = time.monotonic()
+            full = self.count >= self.batch_size
+        if full:
+            if self.thread is not None:
+                self.wakeup.set()
+            else:
+                self.flush()
+
+    def due(self):
+        """
+        True if the oldest buffered point has waited longer than max_latency.
+        """
+        with self.lock:
+            return self.oldest is not None and time.monotonic()-self.oldest >= self.max_latency
+
+    def flush(self):
+        """
+        Write out everything that is buffered. Flushes are serialized so that batches arrive in
+        order.
+        """
+        with self.flush_lock:
+            with self.lock:
+                batches      = self.batches
+                self.batches = {}
+                self.count   = 0
+                self.oldest  = None
+            written = True
+            for database, points in batches.items():
+                if not self.write(points, database):
+                    written = False
+                    if self.spool is not None:
+                        self.spool_batch(points, database)
+            if written and batches and self.spool is not None and self.spool.pending():
+                self.replays += 1
+                try:
+                    self.spool.replay(self.write)
+                except OSError as e:
+                    print(datetime.datetime.now(), "  Replaying the spool failed: "+str(e))
+
+    def spool_batch(self, data, database):
+        """
+        Keep a batch that could not be written in the spool. If that fails too, e.g. because the
+        disk is full, the batch is dropped.
+        """
+        try:
+            self.spool.append(data, database)
+            self.spooled += 1
+        except OSError as e:
+            print(datetime.datetime.now(), "  Spooling "+str(len(data))+" points failed, dropping them: "+str(e))
+            self.dropped += len(data)
+
+    def write(self, data, database):
+        started = time.perf_counter()
+        success = write_lines(client         = self.client,
+                              lines          = data,
+                              database       = database,
+                              precision      = self.precision,
+                              compress_above = self.compress_above
+                             )
+        self.latency.record(time.perf_counter()-started)
+        if success:
+            self.written  += len(data)
+        else:
+            self.failures += 1
+        return success
+
+    def stats(self):
+        """
+        Internal metrics of the write path as influxdb point. The latency histogram starts over
+        after every report.
+        """
+        fields = {'written_points':  self.written,
+                  'write_failures':  self.failures,
+                  'spooled_batches': self.spooled,
+                  'spool_replays':   self.replays,
+                  'dropped_points':  self.dropped
+                 }
+        fields.update(self.latency.report('write_latency'))
+        return [{'measurement': 'collector', 'tags': {'component': 'write'}, 'fields': fields}]
+
+    def run(self):
+        # check more often than max_latency so that the latency bound is roughly kept
+        interval = min(1.0, self.max_latency/4)
+        while not self.stopped.is_set():
+            full = self.wakeup.wait(interval)
+            self.wakeup.clear()
+            if full or self.due():
+                try:
+                    self.flush()
+                except Exception as e:
+                    # the thread has to survive, otherwise the buffer grows without limit
+                    print(datetime.datetime.now(), "  Flushing the write buffer failed: "+repr(e))
+
+    def start(self):
+        """
+        Start a background thread that enforces max_latency.
+        """
+        self.thread = threading.Thread(target=self.run, name='write buffer', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop the background thread and write out what is left.
+        """
+        self.stopped.set()
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.flush()
+
+
+####################################################################################################
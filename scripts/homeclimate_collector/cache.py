@@ -0,0 +1,193 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Local cache of the recent readings of the collector in a SQLite database. Local tools can query the
+last hours or days within milliseconds and without network, also while the influxdb server is down:
+    from homeclimate_collector.cache import ReadingsCache
+    cache = ReadingsCache('/home/pi/homeclimate/cache/readings.sqlite')
+    cache.latest()
+    cache.range('live logging,room=pin17,sensor=DHT22', 'temperature', time.time()-3600)
+Readings are stored in one table per day, so that expired days are dropped as a whole table
+instead of deleting rows. The latest value of every field is kept in a separate table. The
+database runs in WAL mode so that readers never block the collector. The collector writes from a
+background thread and commits in batches to keep the writes to the SD card low.
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import os
+import time
+import queue
+import sqlite3
+import datetime
+import threading
+
+from homeclimate_collector.points import series_name
+
+
+####################################################################################################
+# Readings cache
+####################################################################################################
+
+class ReadingsCache:
+    """
+    Time-partitioned store of readings. The collector calls start() and observe(), local tools only
+    use the query methods.
+    """
+
+    def __init__(self, path, retention_days=7, commit_interval=5):
+        self.path            = path
+        self.retention_days  = retention_days
+        self.commit_interval = commit_interval
+        self.queue           = queue.Queue()
+        self.thread          = None
+        self.tables          = set()
+        self.db              = self.connect()
+
+    def connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        db.execute('CREATE TABLE IF NOT EXISTS latest (series TEXT, field TEXT, time REAL, value REAL, PRIMARY KEY (series, field))')
+        db.commit()
+        return db
+
+    ################################################################################################
+    # writing
+
+    def table(self, seconds):
+        """
+        Name of the table of the day (UTC) of a timestamp. Creates the table on first use.
+        """
+        name = 'readings_'+datetime.datetime.utcfromtimestamp(seconds).strftime('%Y%m%d')
+        if name not in self.tables:
+            self.db.execute('CREATE TABLE IF NOT EXISTS '+name+' (time REAL, series TEXT, field TEXT, value REAL)')
+            self.db.execute('CREATE INDEX IF NOT EXISTS '+name+'_index ON '+name+' (series, field, time)')
+            self.tables.add(name)
+        return name
+
+    def observe(self, name, data, seconds):
+        """
+        Queue the points of a reading of driver name for writing. Called from the polling engine.
+        """
+        self.queue.put((data, seconds))
+
+    def insert(self, data, seconds):
+        rows = []
+        for point in data:
+            series = series_name(point)
+            for field,value in point['fields'].items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    rows.append((seconds, series, field, value))
+        if rows:
+            self.db.executemany('INSERT INTO '+self.table(seconds)+' VALUES (?,?,?,?)', rows)
+            self.db.executemany('INSERT OR REPLACE INTO latest VALUES (?,?,?,?)', [(s,f,t,v) for t,s,f,v in rows])
+
+    def expire(self):
+        """
+        Drop the tables of days that are older than the retention.
+        """
+        oldest = 'readings_'+(datetime.datetime.utcnow()-datetime.timedelta(days=self.retention_days)).strftime('%Y%m%d')
+        for name in self.partitions():
+            if name < oldest:
+                self.db.execute('DROP TABLE '+name)
+                self.tables.discard(name)
+
+    def run(self):
+        last_expire = 0
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            try:
+                self.insert(*item)
+                # collect everything that arrives within the commit interval into one transaction
+                deadline = time.monotonic()+self.commit_interval
+                while True:
+                    item = self.queue.get(timeout=max(0, deadline-time.monotonic()))
+                    if item is None:
+                        break
+                    self.insert(*item)
+            except queue.Empty:
+                pass
+            except Exception as e:
+                print(datetime.datetime.now(), "  Error writing to readings cache: "+repr(e))
+            if time.monotonic()-last_expire > 3600:
+                self.expire()
+                last_expire = time.monotonic()
+            self.db.commit()
+            if item is None:
+                break
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='readings cache', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.queue.put(None)
+        if self.thread is not None:
+            self.thread.join()
+
+    ################################################################################################
+    # queries
+
+    def partitions(self, start=None, end=None):
+        """
+        Names of the day tables that overlap the time range, oldest first.
+        """
+        names = sorted(r[0] for r in self.db.execute("SELECT name FROM sqlite_master WHERE type='table' AND name LIKE 'readings_%'"))
+        if start is not None:
+            names = [n for n in names if n >= 'readings_'+datetime.datetime.utcfromtimestamp(start).strftime('%Y%m%d')]
+        if end is not None:
+            names = [n for n in names if n <= 'readings_'+datetime.datetime.utcfromtimestamp(end).strftime('%Y%m%d')]
+        return names
+
+    def series(self):
+        """
+        All series and fields in the cache.
+        """
+        return self.db.execute('SELECT series, field FROM latest ORDER BY series, field').fetchall()
+
+    def latest(self, series=None):
+        """
+        Latest (series, field, time, value) of every field, optionally of a single series.
+        """
+        if series is None:
+            return self.db.execute('SELECT * FROM latest ORDER BY series, field').fetchall()
+        return self.db.execute('SELECT * FROM latest WHERE series=? ORDER BY field', (series,)).fetchall()
+
+    def range(self, series, field, start, end=None):
+        """
+        (time, value) of a field between start and end (seconds since epoch).
+        """
+        end  = time.time() if end is None else end
+        rows = []
+        for name in self.partitions(start, end):
+            rows += self.db.execute('SELECT time, value FROM '+name+' WHERE series=? AND field=? AND time>=? AND time<=? ORDER BY time',
+                                    (series, field, start, end)).fetchall()
+        return rows
+
+    def downsampled(self, series, field, start, end=None, interval=300):
+        """
+        (start of interval, mean, min, max, count) of a field per interval seconds.
+        """
+        end  = time.time() if end is None else end
+        rows = []
+        for name in self.partitions(start, end):
+            rows += self.db.execute('SELECT CAST(time/? AS INTEGER)*? AS bucket, avg(value), min(value), max(value), count(value) FROM '+name+
+                                    ' WHERE series=? AND field=? AND time>=? AND time<=? GROUP BY bucket ORDER BY bucket',
+                                    (interval, interval, series, field, start, end)).fetchall()
+        return rows
+
+
+####################################################################################################
@@ -0,0 +1,60 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Write data from all collector drivers through a single shared influxdb client.
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import gzip
+import datetime
+import influxdb.exceptions as inexc
+
+
+####################################################################################################
+# Send data to influxdb
+####################################################################################################
+
+def write_lines(client, lines, database, precision='s', compress_above=None, compress_level=1):
+    """
+    Writes a list of encoded line protocol points to the database and prints unexpected results.
+    Successful writes are not printed to keep the logs simple. Returns False if the write failed in
+    a way that is worth retrying later (timeout, server not reachable) and True otherwise. Data
+    rejected by the database is not worth retrying and is dropped.
+    Bodies of at least compress_above bytes are sent gzip compressed. Line protocol compresses well
+    even at the fastest level, higher levels cost a lot of CPU on the Pi for little gain.
+    """
+
+    body    = b'\n'.join(lines)+b'\n'
+    headers = {'Content-Type': 'application/octet-stream'}
+    if compress_above is not None and len(body) >= compress_above:
+        body                        = gzip.compress(body, compresslevel=compress_level)
+        headers['Content-Encoding'] = 'gzip'
+
+    try:
+        client.request(url                    = 'write',
+                       method                 = 'POST',
+                       params                 = {'db': database, 'precision': precision},
+                       data                   = body,
+                       expected_response_code = 204,
+                       headers                = headers
+                      )
+        return True
+    except inexc.InfluxDBServerError:
+        print(datetime.datetime.now(), "  Sending data to database failed due to timeout.")
+    except inexc.InfluxDBClientError as e:
+        print(datetime.datetime.now(), "  Database rejected data: "+str(e))
+        return True
+    except Exception:
+        print(datetime.datetime.now(), "  Encountered unknown error.")
+    return False
+
+
+####################################################################################################
@@ -0,0 +1,76 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Change-based reporting. A field is only written when its value leaves a deadband around the value
+that was last written, or when its heartbeat interval has passed since then. Most fields barely
+change between ticks, so this cuts the number of written values a lot.
+Values that could not be read (None) are never written and do not count as a change. They do mark
+the field as stale though, so the first valid value after a read error is always written. A sensor
+that keeps failing therefore shows up as missing heartbeats instead of a flat line.
+"""
+
+####################################################################################################
+# Deadband filter
+####################################################################################################
+
+class Deadband:
+    """
+    Pipeline stage that drops fields that did not change. bands maps field names to dicts with the
+    optional keys 'absolute' (same unit as the field), 'relative' (fraction of the last written
+    value) and 'heartbeat' (seconds). A value is written if it differs from the last written value
+    by more than the larger of both bands. The entry '*' applies to all fields that are not listed,
+    fields without band are always written.
+    """
+
+    def __init__(self, bands):
+        self.bands = bands
+        self.last  = {}             # (series, field) -> [last written value, time written, stale]
+
+    def report(self, key, band, value, seconds):
+        """
+        True if the value should be written.
+        """
+        state = self.last.get(key)
+        if value is None:
+            if state is not None:
+                state[2] = True
+            return False
+        if state is None or state[2] or isinstance(value, (str, bool)) or state[0] is None:
+            changed = state is None or state[2] or value != state[0]
+        else:
+            width   = max(band.get('absolute') or 0, (band.get('relative') or 0)*abs(state[0]))
+            changed = abs(value-state[0]) > width
+        heartbeat = band.get('heartbeat')
+        if changed or (heartbeat is not None and seconds-state[1] >= heartbeat):
+            self.last[key] = [value, seconds, False]
+            return True
+        return False
+
+    def filter(self, point, seconds):
+        series = (point['measurement'], tuple(sorted(point['tags'].items())))
+        fields = {}
+        for field,value in point['fields'].items():
+            band = self.bands.get(field, self.bands.get('*'))
+            if band is None or self.report((series, field), band, value, seconds):
+                fields[field] = value
+        return fields
+
+    def process(self, batches):
+        output = []
+        for data, seconds, database in batches:
+            filtered = []
+            for point in data:
+                fields = self.filter(point, seconds)
+                if any(value is not None for value in fields.values()):
+                    filtered.append(dict(point, fields=fields))
+            if filtered:
+                output.append((filtered, seconds, database))
+        return output
+
+
+####################################################################################################
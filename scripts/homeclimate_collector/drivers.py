@@ -0,0 +1,133 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Load the sensor scripts as drivers for the collector. Every sensor script keeps working on its own,
+the collector only imports it and calls its read function instead of running its main loop.
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import os
+import datetime
+import importlib.util
+
+
+####################################################################################################
+# Driver
+####################################################################################################
+
+class Driver:
+    """
+    A sensor script loaded as a module. Calling read() returns the same list of influxdb points the
+    script would write on its own. Reads block, so the polling engine runs them in a thread pool.
+    """
+
+    is_async = False
+
+    def __init__(self, name, module, reader, database=None, period=None, timeout=None):
+        self.name     = name
+        self.module   = module
+        self.reader   = getattr(module, reader)
+        self.database = database
+        self.period   = period
+        self.timeout  = timeout
+
+    def read(self):
+        return self.reader()
+
+
+def load_script(path):
+    """
+    Import a sensor script from its path. The module is registered under a prefixed name so that
+    scripts like mh-z19.py do not shadow the sensor library of the same name.
+    """
+
+    name   = 'homeclimate_driver_'+os.path.splitext(os.path.basename(path))[0].replace('-','_')
+    spec   = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_stages(definition):
+    """
+    Processing stages applied to the data of a driver before it is written, in this order.
+    """
+    from homeclimate_collector.aggregate import Aggregator
+    from homeclimate_collector.deadband import Deadband
+    stages = []
+    if 'aggregate' in definition:
+        stages.append(Aggregator(definition['aggregate']))
+    if 'deadband' in definition:
+        stages.append(Deadband(definition['deadband']))
+    return stages
+
+
+def build_adaptive(definition):
+    """
+    Adaptive sampling period of a driver, if configured.
+    """
+    from homeclimate_collector.adaptive import AdaptivePeriod
+    if 'adaptive' in definition:
+        return AdaptivePeriod(**definition['adaptive'])
+    return None
+
+
+def native_drivers():
+    """
+    Drivers implemented in the collector that use a script only for its sensor specific functions.
+    Imported on demand.
+    """
+    from homeclimate_collector.plugs import HS110Poller
+    from homeclimate_collector.oversample import OversampledDriver
+    return {'hs110':      HS110Poller,
+            'oversample': OversampledDriver
+           }
+
+
+def load_drivers(definitions, script_dir, sinks=None):
+    """
+    Load all drivers given as a list of dicts with keys 'script', 'reader' and optionally 'name',
+    'database', 'period' and 'timeout' (seconds). Setting 'native' selects a driver class from
+    native_drivers instead of calling the reader of the script, 'options' are passed on to that
+    class. 'aggregate' lists windows to summarize the readings over instead of writing them (see
+    aggregate.py), 'deadband' gives the bands per field outside of which values are written (see
+    deadband.py), 'adaptive' the settings of an adaptive sampling period (see adaptive.py).
+    'transport' names one of the given sinks to write the data of the driver to instead of the
+    default sink of the engine, e.g. 'udp'. Scripts that fail to import, e.g. because the sensor is
+    not attached, are skipped so that the remaining sensors keep running.
+    """
+
+    drivers = []
+    for definition in definitions:
+        path = os.path.join(script_dir, definition['script'])
+        try:
+            module = load_script(path)
+            kwargs = {'name':     definition.get('name', os.path.splitext(definition['script'])[0]),
+                      'module':   module,
+                      'database': definition.get('database'),
+                      'period':   definition.get('period'),
+                      'timeout':  definition.get('timeout')
+                     }
+            if 'native' in definition:
+                kwargs.update(definition.get('options', {}))
+                driver = native_drivers()[definition['native']](**kwargs)
+            else:
+                driver = Driver(reader=definition['reader'], **kwargs)
+            driver.stages   = build_stages(definition)
+            driver.adaptive = build_adaptive(definition)
+            driver.sink     = (sinks or {})[definition['transport']] if 'transport' in definition else None
+            drivers.append(driver)
+        except Exception as e:
+            print(datetime.datetime.now(), "  Could not load driver "+definition['script']+": "+repr(e)+". Skipping.")
+    return drivers
+
+
+####################################################################################################
@@ -0,0 +1,205 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Asyncio polling engine for the collector. Every driver is polled by its own task on its own aligned
+schedule, so a slow sensor does not delay the others. Blocking drivers run in a bounded thread pool, native
+asyncio drivers run directly in the event loop. Each read has a deadline; a read that misses it is
+abandoned for this tick. Points are stamped with the time of the tick, so that readings of
+different sensors line up, and encoded to line protocol right away.
+Every stats_period seconds the engine writes its self-instrumentation to the 'collector'
+measurement: per driver a histogram of the read latency since the last report, and counters of
+failed reads, timeouts, missed ticks, reads skipped because the previous read of the driver was
+still running and None values, as well as the current sampling period.
+Drivers add their own counters to their point, other components add their own points through
+reporters.
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import time
+import asyncio
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from homeclimate_collector.scheduler import AlignedSchedule
+from homeclimate_collector.points import Encoder
+from homeclimate_collector.instrument import Histogram
+
+
+####################################################################################################
+# Polling engine
+####################################################################################################
+
+class PollingEngine:
+    """
+    Poll all drivers concurrently and pass their encoded points to sink(lines, database). The raw
+    readings of every tick are also passed to every observer as observer.observe(driver name, data,
+    time), with empty data if the read failed. Failed reads are counted per driver in errors.
+    """
+
+    def __init__(self, drivers, sink, period=30, timeout=20, max_workers=4, policy='skip', stats_period=300, precision='s', observers=(), reporters=()):
+        self.drivers      = drivers
+        self.sink         = sink
+        self.period       = period
+        self.timeout      = timeout
+        self.policy       = policy
+        self.stats_period = stats_period
+        self.executor     = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='driver')
+        self.pending      = {}
+        self.schedules    = {}
+        self.errors       = {}
+        self.precision    = precision
+        self.observers    = list(observers)
+        self.reporters    = list(reporters)
+        self.latency      = {}
+        self.timeouts     = {}
+        self.none_values  = {}
+        self.busy_skips   = {}
+        self.encoder      = Encoder(precision)
+
+    def busy(self, driver):
+        """
+        Blocking reads cannot be interrupted, a read that misses its deadline keeps running in its
+        thread. The driver is skipped until that read has finished, which keeps a hanging sensor
+        from filling up the thread pool.
+        """
+        pending = self.pending.get(driver.name)
+        return pending is not None and not pending.done()
+
+    async def read(self, driver):
+        """
+        Read a driver within its deadline.
+        """
+        timeout = driver.timeout or self.timeout
+        if driver.is_async:
+            started = time.perf_counter()
+            data    = await asyncio.wait_for(driver.read(), timeout)
+            self.latency[driver.name].record(time.perf_counter()-started)
+            return data
+        pending = asyncio.get_running_loop().run_in_executor(self.executor, self.timed, driver)
+        self.pending[driver.name] = pending
+        return await asyncio.wait_for(asyncio.shield(pending), timeout)
+
+    def timed(self, driver):
+        """
+        Blocking read, timed in its thread so that waiting for a free thread is not counted.
+        """
+        started = time.perf_counter()
+        data    = driver.read()
+        self.latency[driver.name].record(time.perf_counter()-started)
+        return data
+
+    async def poll(self, driver):
+        """
+        Poll a single driver forever.
+        """
+        adaptive = getattr(driver, 'adaptive', None)
+        period   = adaptive.period if adaptive else driver.period or self.period
+        schedule = AlignedSchedule(period, self.policy)
+        encoder  = Encoder(self.precision)
+        self.schedules[driver.name] = schedule
+        self.errors[driver.name]      = 0
+        self.timeouts[driver.name]    = 0
+        self.none_values[driver.name] = 0
+        self.busy_skips[driver.name]  = 0
+        self.latency[driver.name]     = Histogram()
+        while True:
+            tick = await schedule.wait()
+            data = []
+            if self.busy(driver):
+                self.busy_skips[driver.name] += 1
+                print(datetime.datetime.now(), "  Driver "+driver.name+" is still busy with its previous read. Skipping.")
+            else:
+                try:
+                    data = await self.read(driver)
+                except asyncio.TimeoutError:
+                    self.errors[driver.name]   += 1
+                    self.timeouts[driver.name] += 1
+                    print(datetime.datetime.now(), "  Reading driver "+driver.name+" timed out.")
+                except Exception as e:
+                    self.errors[driver.name] += 1
+                    print(datetime.datetime.now(), "  Error reading driver "+driver.name+": "+repr(e))
+            # drivers pass dummy data with all fields None when reading the sensor failed
+            values = [value for point in data for value in point['fields'].values()]
+            self.none_values[driver.name] += values.count(None)
+            if values and values.count(None) == len(values):
+                self.errors[driver.name] += 1
+            try:
+                for observer in self.observers:
+                    observer.observe(driver.name, data, tick)
+                if not data:
+                    continue
+                if adaptive is not None:
+                    period = adaptive.update(data, tick, driver.name)
+                    if period != schedule.period:
+                        schedule.set_period(period)
+                self.process(driver, encoder, data, tick)
+            except Exception as e:
+                print(datetime.datetime.now(), "  Error processing data of driver "+driver.name+": "+repr(e))
+
+    def process(self, driver, encoder, data, tick):
+        """
+        Pass the data of a tick through the processing stages of the driver, encode what comes out
+        and hand it to the sink of the driver, if it has its own, or the sink of the engine.
+        """
+        batches = [(data, tick, driver.database)]
+        for stage in getattr(driver, 'stages', []):
+            batches = stage.process(batches)
+        sink    = getattr(driver, 'sink', None) or self.sink
+        for data, seconds, database in batches:
+            lines = encoder.encode(data, seconds)
+            if lines:
+                sink(lines, database)
+
+    def stats(self):
+        """
+        Internal metrics of the engine as influxdb points, one per driver. The latency histograms
+        start over after every report. Drivers can add their own counters, e.g. of retries, with a
+        stats() method that returns fields.
+        """
+        stats   = []
+        drivers = {driver.name: driver for driver in self.drivers}
+        for name,schedule in self.schedules.items():
+            fields = {'missed_ticks': schedule.missed,
+                      'period':       float(schedule.period),
+                      'errors':       self.errors[name],
+                      'timeouts':     self.timeouts[name],
+                      'none_values':  self.none_values[name],
+                      'busy_skips':   self.busy_skips[name]
+                     }
+            fields.update(self.latency[name].report('read_latency'))
+            if hasattr(drivers[name], 'stats'):
+                fields.update(drivers[name].stats())
+            stats.append({'measurement': 'collector', 'tags': {'driver': name}, 'fields': fields})
+        return stats
+
+    async def report(self):
+        """
+        Periodically write the internal metrics.
+        """
+        schedule = AlignedSchedule(self.stats_period)
+        while True:
+            tick  = await schedule.wait()
+            stats = self.stats()
+            for reporter in self.reporters:
+                stats += reporter.stats()
+            self.sink(self.encoder.encode(stats, tick), None)
+
+    async def run(self):
+        """
+        Poll all drivers until cancelled.
+        """
+        try:
+            await asyncio.gather(self.report(), *[self.poll(driver) for driver in self.drivers])
+        finally:
+            self.executor.shutdown(wait=False)
+
+
+####################################################################################################
@@ -0,0 +1,214 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Ingestion gateway for remote sensor nodes, e.g. the ESP32 nodes of V2. Nodes send their readings as
+UDP datagrams, each holding a JSON point in the same format the sensor scripts return, or a list of
+such points:
+    {"measurement": "live logging",
+     "tags": {"room": "kitchen", "sensor": "ESP32 kitchen"},
+     "fields": {"temperature": 21.3, "humidity": 45, "pressure": 1013.2},
+     "time": 1700000000.5}
+'measurement' defaults to 'live logging' and has to be one of measurements, by default only
+'live logging'. 'time' in seconds since epoch is optional, readings without a valid time or with a
+time further than max_skew seconds from the clock of the gateway are stamped with the time they
+arrived. Values are checked with the range checks of the sensor scripts, see validation.py; invalid
+values are dropped and points without any valid value are discarded. All points go to a single
+sink, normally the write buffer, so that any number of nodes share one batched write stream. A
+single socket served by asyncio handles thousands of nodes without a thread or connection per node.
+Points with more than max_tags tags or tags longer than max_tag_length characters are rejected.
+Once max_series different series have been seen, points of new series are rejected and counted, so
+that a faulty node, e.g. one that puts a counter into a tag, cannot grow the memory of the gateway
+and the number of series in influxdb without limit.
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import json
+import math
+import time
+import socket
+import asyncio
+import datetime
+from collections import OrderedDict
+
+from homeclimate_collector.points import Encoder
+from homeclimate_collector.scheduler import AlignedSchedule
+from homeclimate_collector.validation import validate
+
+
+####################################################################################################
+# Gateway
+####################################################################################################
+
+class Gateway(asyncio.DatagramProtocol):
+    """
+    Receive points from remote nodes and pass them encoded to sink(lines, database).
+    """
+
+    def __init__(self, sink, host='', port=9120, database=None, precision='s', max_skew=300, max_fields=32,
+                 measurements=('live logging',), max_tags=8, max_tag_length=64, max_series=10000, max_sources=10000,
+                 receive_buffer=4194304, stats_period=300, reporters=()):
+        self.sink           = sink
+        self.address        = (host, port)
+        self.database       = database
+        self.max_skew       = max_skew
+        self.max_fields     = max_fields
+        self.measurements   = set(measurements)
+        self.max_tags       = max_tags
+        self.max_tag_length = max_tag_length
+        self.max_series     = max_series
+        self.max_sources    = max_sources
+        self.receive_buffer = receive_buffer
+        self.stats_period   = stats_period
+        self.reporters      = list(reporters)
+        self.encoder        = Encoder(precision)
+        self.transport      = None
+        self.sources        = OrderedDict()
+        self.datagrams      = 0
+        self.malformed      = 0
+        self.accepted       = 0
+        self.rejected       = 0
+        self.invalid_values = 0
+        self.new_series     = 0
+
+    # protocol
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, address):
+        self.datagrams += 1
+        self.add_source(address[0])
+        try:
+            points = json.loads(data)
+        except ValueError:
+            self.malformed += 1
+            return
+        if isinstance(points, dict):
+            points = [points]
+        if not isinstance(points, list):
+            self.malformed += 1
+            return
+        now   = time.time()
+        lines = []
+        for point in points:
+            try:
+                line = self.encode(point, now)
+            except (ValueError, TypeError, OverflowError):
+                # one broken point must not take the valid points of the same datagram with it
+                line = None
+            if line is None:
+                self.rejected += 1
+            else:
+                self.accepted += 1
+                lines.append(line)
+        if lines:
+            self.sink(lines, self.database)
+
+    def error_received(self, exc):
+        print(datetime.datetime.now(), "  Gateway socket error: "+repr(exc))
+
+    def add_source(self, host):
+        """
+        Remember the most recent max_sources addresses that sent data.
+        """
+        self.sources[host] = None
+        self.sources.move_to_end(host)
+        if len(self.sources) > self.max_sources:
+            self.sources.popitem(last=False)
+
+    # points
+
+    def encode(self, point, now):
+        """
+        Line protocol of a single point received from a node, or None if it is not valid.
+        """
+        if not isinstance(point, dict):
+            return None
+        measurement = point.get('measurement', 'live logging')
+        tags        = point.get('tags', {})
+        fields      = point.get('fields')
+        if measurement not in self.measurements:
+            return None
+        if not isinstance(tags, dict) or len(tags) > self.max_tags:
+            return None
+        if not all(isinstance(k, str) and isinstance(v, str) and 0 < len(k) <= self.max_tag_length and 0 < len(v) <= self.max_tag_length for k,v in tags.items()):
+            return None
+        if not isinstance(fields, dict) or not fields or len(fields) > self.max_fields:
+            return None
+        fields,invalid = validate(fields)
+        self.invalid_values += invalid
+        seconds = point.get('time')
+        if isinstance(seconds, bool) or not isinstance(seconds, (int, float)) or not math.isfinite(seconds) or abs(seconds-now) > self.max_skew:
+            seconds = now
+        key = (measurement, tuple(sorted(tags.items())))
+        if key not in self.encoder.series and len(self.encoder.series) >= self.max_series:
+            if self.new_series == 0:
+                print(datetime.datetime.now(), "  Gateway reached "+str(self.max_series)+" series. Rejecting new series.")
+            self.new_series += 1
+            return None
+        series = self.encoder.get_series(measurement, tags)
+        return series.encode(fields, self.encoder.timestamp(seconds))
+
+    # running
+
+    def stats(self):
+        """
+        Internal metrics of the gateway as influxdb point.
+        """
+        return [{'measurement': 'collector',
+                 'tags':        {'component': 'gateway'},
+                 'fields':      {'datagrams':       self.datagrams,
+                                 'malformed':       self.malformed,
+                                 'accepted_points': self.accepted,
+                                 'rejected_points': self.rejected,
+                                 'invalid_values':  self.invalid_values,
+                                 'rejected_series': self.new_series,
+                                 'sources':         len(self.sources),
+                                 'series':          len(self.encoder.series)
+                                }
+                }]
+
+    def open_socket(self):
+        """
+        UDP socket with a large receive buffer, so that bursts of datagrams from many nodes that
+        report at the same time are not dropped by the kernel.
+        """
+        family = socket.AF_INET6 if ':' in self.address[0] else socket.AF_INET
+        sock   = socket.socket(family, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.receive_buffer)
+        except OSError:
+            print(datetime.datetime.now(), "  Could not enlarge the receive buffer of the gateway.")
+        sock.bind(self.address)
+        return sock
+
+    async def run(self):
+        """
+        Receive until cancelled and periodically write the internal metrics.
+        """
+        loop = asyncio.get_running_loop()
+        await loop.create_datagram_endpoint(lambda: self, sock=self.open_socket())
+        print(datetime.datetime.now(), "  Gateway listening on UDP port "+str(self.address[1])+".")
+        schedule = AlignedSchedule(self.stats_period)
+        encoder  = Encoder(self.encoder.precision)
+        try:
+            while True:
+                tick  = await schedule.wait()
+                stats = self.stats()
+                for reporter in self.reporters:
+                    stats += reporter.stats()
+                self.sink(encoder.encode(stats, tick), None)
+        finally:
+            self.transport.close()
+
+
+####################################################################################################
@@ -0,0 +1,95 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Low-overhead latency histograms for the self-instrumentation of the collector. Recording a value
+only increments a counter in a fixed list of exponential buckets, percentiles are estimated from
+the buckets when the histogram is reported. Histograms are recorded from the engine, its worker
+threads and the write buffer thread and reported from the event loop, so both take a lock.
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import threading
+from bisect import bisect_left
+
+
+####################################################################################################
+# Histogram
+####################################################################################################
+
+bounds = [0.001*2**i for i in range(17)]        # upper bucket bounds in seconds, 1 ms to 65 s
+
+
+class Histogram:
+    """
+    Latency histogram in seconds with buckets doubling from 1 ms. Values above the last bound go
+    into an overflow bucket.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.counts  = [0]*(len(bounds)+1)
+        self.count   = 0
+        self.total   = 0.0
+        self.maximum = 0.0
+
+    def reset(self):
+        with self.lock:
+            self.clear()
+
+    def record(self, seconds):
+        bucket = bisect_left(bounds, seconds)
+        with self.lock:
+            self.counts[bucket] += 1
+            self.count          += 1
+            self.total          += seconds
+            if seconds > self.maximum:
+                self.maximum = seconds
+
+    def quantile(self, q):
+        """
+        Upper bound of the bucket that contains the q quantile, at most the largest recorded value.
+        """
+        rank = q*self.count
+        seen = 0
+        for i,count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count > 0:
+                return min(bounds[i], self.maximum) if i < len(bounds) else self.maximum
+        return self.maximum
+
+    def fields(self, prefix):
+        """
+        Summary as influxdb fields, or no fields if nothing was recorded.
+        """
+        if self.count == 0:
+            return {}
+        return {prefix+'_count': self.count,
+                prefix+'_mean':  self.total/self.count,
+                prefix+'_p50':   self.quantile(0.5),
+                prefix+'_p90':   self.quantile(0.9),
+                prefix+'_p99':   self.quantile(0.99),
+                prefix+'_max':   self.maximum
+               }
+
+    def report(self, prefix):
+        """
+        fields() and reset() in one step, so that no value recorded in between is lost.
+        """
+        with self.lock:
+            fields = self.fields(prefix)
+            self.clear()
+        return fields
+
+
+####################################################################################################
@@ -0,0 +1,127 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Serve the latest readings of the collector over HTTP in the Prometheus text exposition format, so
+that dashboards and alerting that only need current values do not have to go through influxdb:
+    curl http://raspberrypi:9110/metrics
+Every field the drivers read is exported with its value and the time it was read, together with the
+number of failed reads per driver. A field that could not be read (None) is removed until it is read
+again, so that a failed sensor does not keep exporting its last reading as current. The response is
+rendered once per tick when new readings arrive and every scrape just sends that buffer.
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import re
+import math
+import threading
+import http.server
+
+
+####################################################################################################
+# Exposition format
+####################################################################################################
+
+def label(name):
+    """
+    Turn a tag name into a valid Prometheus label name.
+    """
+    name = re.sub('[^a-zA-Z0-9_]', '_', name)
+    return '_'+name if name[:1].isdigit() else name
+
+def label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def labels(pairs):
+    return '{'+','.join(label(k)+'="'+label_value(v)+'"' for k,v in pairs)+'}'
+
+def sample_value(value):
+    """
+    Float as written in the exposition format, which spells non-finite values NaN, +Inf and -Inf.
+    """
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value)
+
+
+####################################################################################################
+# Metrics server
+####################################################################################################
+
+class MetricsServer:
+    """
+    Observer of the polling engine that keeps the latest value of every field. errors is the dict of
+    failed reads per driver kept by the engine.
+    """
+
+    def __init__(self, errors, host='', port=9110):
+        self.errors  = errors
+        self.address = (host, port)
+        self.latest  = {}               # label string -> (value, time)
+        self.lock    = threading.Lock()
+        self.body    = b''
+        self.server  = None
+
+    def observe(self, name, data, seconds):
+        with self.lock:
+            for point in data:
+                pairs = [('measurement', point['measurement'])]+sorted(point['tags'].items())
+                for field,value in point['fields'].items():
+                    if value is None:
+                        self.latest.pop(labels(pairs+[('field', field)]), None)
+                    elif isinstance(value, (int, float)):
+                        self.latest[labels(pairs+[('field', field)])] = (float(value), seconds)
+            self.render()
+
+    def render(self):
+        """
+        Build the response once, scrapes only send it.
+        """
+        lines = ['# HELP homeclimate_reading Latest reading of a sensor field.',
+                 '# TYPE homeclimate_reading gauge']
+        lines += ['homeclimate_reading'+key+' '+sample_value(value) for key,(value,seconds) in sorted(self.latest.items())]
+        lines += ['# HELP homeclimate_reading_timestamp_seconds Time of the latest reading of a sensor field.',
+                  '# TYPE homeclimate_reading_timestamp_seconds gauge']
+        lines += ['homeclimate_reading_timestamp_seconds'+key+' '+repr(float(seconds)) for key,(value,seconds) in sorted(self.latest.items())]
+        lines += ['# HELP homeclimate_driver_read_errors_total Failed reads per driver.',
+                  '# TYPE homeclimate_driver_read_errors_total counter']
+        lines += ['homeclimate_driver_read_errors_total'+labels([('driver', name)])+' '+str(count) for name,count in sorted(self.errors.items())]
+        self.body = ('\n'.join(lines)+'\n').encode('utf-8')
+
+    def start(self):
+        metrics = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.body
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(self.address, Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name='metrics', daemon=True).start()
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+
+
+####################################################################################################
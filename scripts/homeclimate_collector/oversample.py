@@ -0,0 +1,164 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Oversample slow or flaky sensors in the background. A thread reads the sensor as often as it
+allows and keeps the readings in a small ring buffer. On every tick the driver summarizes the
+readings since the previous tick instantly, instead of waiting for a read with retries. The median
+is written under the original field name, so a single bad reading does not end up in the
+database, and mean, min, max and the number of samples are added. Without any valid reading the
+driver passes dummy data with all fields None, so that the collector counts the failure.
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import time
+import datetime
+import statistics
+import threading
+from collections import deque
+
+
+####################################################################################################
+# Oversampler
+####################################################################################################
+
+class Oversampler:
+    """
+    Call read() every interval seconds in a background thread and keep the last size results
+    together with the monotonic time they were taken.
+    """
+
+    def __init__(self, read, interval=2, size=32, name='sensor'):
+        self.name     = name
+        self.read     = read
+        self.interval = interval
+        self.samples  = deque(maxlen=size)
+        self.lock     = threading.Lock()
+        self.stopped  = threading.Event()
+        self.errors   = 0
+        self.empty    = 0
+        self.failing  = False
+        self.thread   = threading.Thread(target=self.run, name='oversampler', daemon=True)
+
+    def run(self):
+        while not self.stopped.is_set():
+            started = time.monotonic()
+            try:
+                sample = self.read()
+                with self.lock:
+                    self.samples.append((started, sample))
+                if not any(v is not None for point in sample for v in point['fields'].values()):
+                    self.empty += 1
+                self.failing = False
+            except Exception as e:
+                if not self.failing:
+                    print(datetime.datetime.now(), "  Error oversampling "+self.name+": "+repr(e))
+                self.failing  = True
+                self.errors  += 1
+            self.stopped.wait(max(0, self.interval-(time.monotonic()-started)))
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def recent(self, since):
+        """
+        Samples taken after the given monotonic time.
+        """
+        with self.lock:
+            return [sample for taken,sample in self.samples if taken > since]
+
+
+####################################################################################################
+# Oversampled driver
+####################################################################################################
+
+def summarize(values, digits=None):
+    """
+    Median, mean, min and max of the valid values. The median is rounded to the given number of
+    digits, with 0 digits it is an integer like in the standalone scripts. The others are always
+    floats so that their field type in influxdb does not change.
+    """
+    values = [v for v in values if v is not None]
+    if not values:
+        return None, None, None, None
+    median = statistics.median(values)
+    if digits == 0:
+        median = int(round(median))
+    elif digits is not None:
+        median = round(median, digits)
+    return median, float(statistics.mean(values)), float(min(values)), float(max(values))
+
+
+class OversampledDriver:
+    """
+    Driver for a script that provides a quick single reading function (sampler) returning a point
+    in the same format as its read function. digits gives the rounding of the median per field.
+    """
+
+    is_async = False
+
+    def __init__(self, name, module, database=None, period=None, timeout=None, sampler='read_raw', interval=2, size=32, digits=None):
+        self.name      = name
+        self.module    = module
+        self.database  = database
+        self.period    = period
+        self.timeout   = timeout
+        self.digits    = digits or {}
+        self.last_read = 0
+        self.series    = {}
+        self.sampler   = Oversampler(getattr(module, sampler), interval=interval, size=size, name=name)
+        self.sampler.start()
+
+    def read(self):
+        """
+        Summary of the samples taken since the previous tick, one point per series the sampler
+        returns. Series without any valid reading get dummy data with all fields None, like the
+        read function of the script passes when the sensor cannot be read.
+        """
+        since, self.last_read = self.last_read, time.monotonic()
+        samples = self.sampler.recent(since)
+
+        series = {key: [] for key in self.series}
+        for sample in samples:
+            for point in sample:
+                key = (point['measurement'], tuple(sorted(point['tags'].items())))
+                series.setdefault(key, []).append(point['fields'])
+                self.series[key] = list(point['fields'].keys())
+        if not series:
+            raise RuntimeError("No readings of "+self.name+" since start.")
+
+        data = []
+        for (measurement, tags), readings in series.items():
+            valid = [r for r in readings if any(v is not None for v in r.values())]
+            if not valid:
+                print(datetime.datetime.now(), "  No valid readings of "+self.name+" since last tick. Passing dummy data.")
+                fields = {field: None for field in self.series[(measurement, tags)]}
+            else:
+                fields = {}
+                for field in readings[-1].keys():
+                    values = [r.get(field) for r in readings]
+                    median, mean, low, high = summarize(values, self.digits.get(field))
+                    fields.update({field: median, field+'_mean': mean, field+'_min': low, field+'_max': high})
+                fields['samples'] = len(valid)
+            data.append({'measurement': measurement, 'tags': dict(tags), 'fields': fields})
+        return data
+
+    def stats(self):
+        """
+        Failed samples, added to the internal metrics of the driver: reads that raised and reads
+        without any valid value.
+        """
+        return {'sample_errors': self.sampler.errors, 'empty_samples': self.sampler.empty}
+
+
+####################################################################################################
@@ -0,0 +1,181 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Native asyncio driver for TP-Link HS110 smart plugs. Any number of plugs is polled concurrently and
+the readings of all plugs are returned together, so they end up in one database write per tick.
+Connections are kept open across polls if the plug allows it and are re-established with
+exponential backoff when a plug cannot be reached.
+The protocol handling (encryption and decoding of the power data) is taken from hs110.py, only the
+network I/O is asynchronous.
+Readings are tagged with the name of their plug. A plug without name is written without plug tag,
+into the same series as hs110.py writes, so that existing queries and dashboards keep working for
+the original plug. Giving it a name later starts a new series.
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import struct
+import asyncio
+import datetime
+
+
+####################################################################################################
+# Plug connection
+####################################################################################################
+
+class Plug:
+    """
+    Connection to a single plug.
+    """
+
+    def __init__(self, name, ip, port=9999, connect_timeout=10, max_backoff=300):
+        self.name            = name
+        self.ip              = ip
+        self.port            = port
+        self.connect_timeout = connect_timeout
+        self.max_backoff     = max_backoff
+        self.backoff         = 0
+        self.retry_at        = 0
+        self.persistent      = True
+        self.reader          = None
+        self.writer          = None
+        self.connects        = 0
+        self.connect_errors  = 0
+        self.retries         = 0
+
+    async def connect(self):
+        loop = asyncio.get_running_loop()
+        if loop.time() < self.retry_at:
+            raise ConnectionError("Waiting "+str(round(self.retry_at-loop.time()))+" s before reconnecting to HS110 at IP "+str(self.ip))
+        try:
+            self.reader, self.writer = await asyncio.wait_for(asyncio.open_connection(self.ip, self.port), self.connect_timeout)
+        except Exception:
+            self.backoff         = min(max(2*self.backoff, 1), self.max_backoff)
+            self.retry_at        = loop.time()+self.backoff
+            self.connect_errors += 1
+            raise ConnectionError("Could not connect to HS110 at IP "+str(self.ip)+" on port "+str(self.port))
+        self.backoff   = 0
+        self.connects += 1
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = None
+        self.writer = None
+
+    async def exchange(self, request):
+        """
+        Send an encrypted request and return the encrypted response including its length prefix.
+        """
+        self.writer.write(request)
+        await self.writer.drain()
+        prefix = await self.reader.readexactly(4)
+        length = struct.unpack('>I', prefix)[0]
+        if length > 1000000:
+            raise ConnectionError("HS110 response of "+str(length)+" bytes is too large.")
+        return prefix + await self.reader.readexactly(length)
+
+    async def query(self, request):
+        """
+        Send a request over the open connection, connecting first if necessary. If a kept-open
+        connection turns out to be closed by the plug, the request is repeated once on a fresh
+        connection and the plug is no longer kept open.
+        """
+        reused = self.writer is not None
+        try:
+            if not reused:
+                await self.connect()
+            try:
+                response = await self.exchange(request)
+            except (EOFError, OSError):
+                # a closed connection shows up as IncompleteReadError (an EOFError) or as any
+                # of the OSErrors of a reset socket
+                if not reused:
+                    raise
+                self.close()
+                self.persistent  = False
+                self.retries    += 1
+                await self.connect()
+                response = await self.exchange(request)
+        except BaseException:
+            # also on cancellation: the stream is in an unknown state
+            self.close()
+            raise
+        if not self.persistent:
+            self.close()
+        return response
+
+
+####################################################################################################
+# HS110 poller
+####################################################################################################
+
+class HS110Poller:
+    """
+    Poll a list of HS110 plugs given as dicts with keys 'ip' and optionally 'name' and 'port'.
+    module is the loaded hs110.py script, which provides the protocol functions and the address of
+    the plug used without name if no plugs are given.
+    """
+
+    is_async = True
+
+    def __init__(self, name, module, database=None, period=None, timeout=None, plugs=None, plug_timeout=5):
+        self.name         = name
+        self.module       = module
+        self.database     = database
+        self.period       = period
+        self.timeout      = timeout
+        self.plug_timeout = plug_timeout
+        if plugs is None:
+            plugs = [{'ip': module.ip, 'port': module.port}]
+        self.plugs        = [Plug(p.get('name') or p['ip'], p['ip'], p.get('port', 9999)) for p in plugs]
+        self.tags         = [{'sensor': 'HS110', 'plug': p['name']} if p.get('name') else {'sensor': 'HS110'} for p in plugs]
+        self.request      = module.encrypt(module.command)
+        self.errors       = 0
+
+    async def read_plug(self, plug, tags, polltime):
+        """
+        Read a single plug within plug_timeout, so that one unresponsive plug does not hold up
+        the others.
+        """
+        try:
+            data = self.module.decrypt_power(await asyncio.wait_for(plug.query(self.request), self.plug_timeout))
+        except (OSError, EOFError, asyncio.TimeoutError):
+            print(polltime, "  Error contacting HS110 "+plug.name+". Passing dummy data.")
+            data = {'voltage': None, 'current': None, 'power': None, 'energy_total': None, 'error_code': 9999}
+            self.errors += 1
+        except TypeError:
+            print(polltime, "  Error decrypting data of HS110 "+plug.name+". Passing dummy data.")
+            data = {'voltage': None, 'current': None, 'power': None, 'energy_total': None, 'error_code': 9999}
+            self.errors += 1
+
+        return {'measurement': 'power',
+                'tags': tags,
+                'time': polltime,
+                'fields': data
+               }
+
+    async def read(self):
+        polltime = datetime.datetime.utcnow().isoformat()
+        return list(await asyncio.gather(*[self.read_plug(plug, tags, polltime) for plug,tags in zip(self.plugs, self.tags)]))
+
+    def stats(self):
+        """
+        Counters of all plugs, added to the internal metrics of the driver. Every connection after
+        the first one of a plug counts as reconnect.
+        """
+        return {'plug_errors':    self.errors,
+                'reconnects':     sum(max(0, plug.connects-1) for plug in self.plugs),
+                'connect_errors': sum(plug.connect_errors for plug in self.plugs),
+                'retries':        sum(plug.retries for plug in self.plugs)
+               }
+
+
+####################################################################################################
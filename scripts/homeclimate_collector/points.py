@@ -0,0 +1,168 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Compact point representation that encodes directly to influxdb line protocol. The measurement and
+tag set of a series never change, so they are escaped and encoded once per series and reused for
+every point. Timestamps are integers in a fixed precision instead of iso strings that the influxdb
+client would parse and serialize again.
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import math
+
+
+####################################################################################################
+# Line protocol
+####################################################################################################
+
+precisions = {'s': 1, 'ms': 1000, 'u': 1000000, 'n': 1000000000}
+
+
+def escape_measurement(name):
+    return str(name).replace('\\', '\\\\').replace(',', '\\,').replace(' ', '\\ ').replace('\n', '\\n')
+
+def escape_key(key):
+    """
+    Escape tag keys, tag values and field keys.
+    """
+    return escape_measurement(key).replace('=', '\\=')
+
+def encode_value(value):
+    """
+    Encode a field value the same way the influxdb client does, so that field types stay the same
+    as in the data written by the standalone scripts. Returns None for values that cannot be
+    written (None, nan, inf).
+    """
+    if isinstance(value, bool):
+        return b'true' if value else b'false'
+    if isinstance(value, int):
+        return b'%di' % value
+    if isinstance(value, float):
+        if math.isfinite(value):
+            return repr(value).encode()
+        return None
+    if isinstance(value, str):
+        return ('"'+value.replace('\\', '\\\\').replace('"', '\\"')+'"').encode('utf-8')
+    if value is None:
+        return None
+    return repr(float(value)).encode()
+
+
+def series_name(point):
+    """
+    Name of the series of a point dict: measurement and tags as in line protocol, without escaping.
+    """
+    return ','.join([point['measurement']]+[k+'='+str(v) for k,v in sorted(point['tags'].items())])
+
+
+####################################################################################################
+# Series and points
+####################################################################################################
+
+class Series:
+    """
+    Measurement and tag set of a series, pre-encoded as line protocol. Encoded field keys are
+    cached as well.
+    """
+
+    __slots__ = ('measurement', 'tags', 'key', 'field_keys')
+
+    def __init__(self, measurement, tags):
+        self.measurement = measurement
+        self.tags        = dict(tags)
+        key              = escape_measurement(measurement)
+        for tag,value in sorted(self.tags.items()):
+            key += ','+escape_key(tag)+'='+escape_key(value)
+        self.key         = key.encode('utf-8')+b' '
+        self.field_keys  = {}
+
+    def field_key(self, field):
+        key = self.field_keys.get(field)
+        if key is None:
+            key = self.field_keys[field] = escape_key(field).encode('utf-8')+b'='
+        return key
+
+    def encode(self, fields, timestamp):
+        """
+        Encode one point of this series. timestamp is an integer in the precision of the write.
+        Fields that are None are left out; returns None if no field is left.
+        """
+        encoded = []
+        for field,value in fields.items():
+            value = encode_value(value)
+            if value is not None:
+                encoded.append(self.field_key(field)+value)
+        if not encoded:
+            return None
+        return self.key+b','.join(encoded)+b' %d' % timestamp
+
+
+class Point:
+    """
+    A single reading of a series.
+    """
+
+    __slots__ = ('series', 'fields', 'time')
+
+    def __init__(self, series, fields, time):
+        self.series = series
+        self.fields = fields
+        self.time   = time
+
+    def encode(self):
+        return self.series.encode(self.fields, self.time)
+
+
+####################################################################################################
+# Encoder
+####################################################################################################
+
+class Encoder:
+    """
+    Convert the point dicts returned by the drivers to line protocol. One encoder is used per
+    driver, so it only ever holds the few series that driver writes.
+    """
+
+    def __init__(self, precision='s'):
+        self.precision = precision
+        self.scale     = precisions[precision]
+        self.series    = {}
+
+    def get_series(self, measurement, tags):
+        key    = (measurement, tuple(sorted(tags.items())))
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = Series(measurement, tags)
+        return series
+
+    def timestamp(self, seconds):
+        """
+        Convert seconds since epoch to an integer timestamp in the precision of this encoder.
+        """
+        return int(round(seconds*self.scale))
+
+    def points(self, data, seconds):
+        """
+        Point objects for the given driver data, all stamped with the given time.
+        """
+        timestamp = self.timestamp(seconds)
+        return [Point(self.get_series(p['measurement'], p.get('tags', {})), p['fields'], timestamp) for p in data]
+
+    def encode(self, data, seconds):
+        """
+        Line protocol for the given driver data, all stamped with the given time. Points without
+        any valid field are dropped.
+        """
+        lines = [point.encode() for point in self.points(data, seconds)]
+        return [line for line in lines if line is not None]
+
+
+####################################################################################################
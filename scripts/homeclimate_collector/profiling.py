@@ -0,0 +1,168 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+On-demand profiling of a running collector. Profiling is triggered by signals so that a collector
+that misbehaves can be inspected without restarting it and losing the state that caused the problem:
+    kill -USR1 <pid>    profile the event loop with cProfile and diff tracemalloc snapshots
+    kill -USR2 <pid>    sample the stacks of all threads, including the sensor reads in the workers
+Each run lasts 'duration' seconds and dumps its results into 'directory':
+    <time>.prof         cProfile statistics, for pstats or snakeviz
+    <time>.txt          the top functions by cumulative time
+    <time>.memory.txt   the largest allocation differences between start and end of the run
+    <time>.stacks.txt   sampled stacks in collapsed format, one stack and its count per line, for
+                        flamegraph.pl or speedscope
+While no run is active, nothing but the two signal handlers is installed.
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import os
+import sys
+import time
+import signal
+import pstats
+import cProfile
+import datetime
+import threading
+import tracemalloc
+import collections
+
+
+####################################################################################################
+# Profiler
+####################################################################################################
+
+class Profiler:
+    """
+    Signal-triggered cProfile, tracemalloc and sampling runs of limited duration.
+    """
+
+    def __init__(self, directory, duration=60, interval=0.01, frames=10, top=50):
+        self.directory = directory
+        self.duration  = duration
+        self.interval  = interval
+        self.frames    = frames
+        self.top       = top
+        self.active    = False
+        self.loop      = None
+        self.profile   = None
+        self.snapshot  = None
+
+    def install(self, loop):
+        """
+        Register the signal handlers with the running event loop.
+        """
+        self.loop = loop
+        loop.add_signal_handler(signal.SIGUSR1, self.start_profile)
+        loop.add_signal_handler(signal.SIGUSR2, self.start_sampling)
+
+    def path(self, suffix):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.datetime.now().strftime('%Y%m%dT%H%M%S')
+        return os.path.join(self.directory, stamp+suffix)
+
+    def claim(self):
+        """
+        Only one run at a time, overlapping runs would disturb each other.
+        """
+        if self.active:
+            print(datetime.datetime.now(), "  Profiling already running, signal ignored.")
+            return False
+        self.active = True
+        return True
+
+    # cProfile and tracemalloc
+
+    def start_profile(self):
+        """
+        Runs in the event loop thread, so the profiler hooks into the thread that runs the engine.
+        """
+        if not self.claim():
+            return
+        print(datetime.datetime.now(), "  Profiling for "+str(self.duration)+" seconds.")
+        tracemalloc.start(self.frames)
+        self.snapshot = tracemalloc.take_snapshot()
+        self.profile  = cProfile.Profile()
+        self.profile.enable()
+        self.loop.call_later(self.duration, self.stop_profile)
+
+    def stop_profile(self):
+        if self.profile is None:
+            return
+        self.profile.disable()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        try:
+            self.dump_profile(self.profile, self.snapshot, snapshot)
+        except OSError as e:
+            print(datetime.datetime.now(), "  Could not write profile: "+str(e))
+        self.profile  = None
+        self.snapshot = None
+        self.active   = False
+
+    def dump_profile(self, profile, before, after):
+        path = self.path('')
+        profile.dump_stats(path+'.prof')
+        with open(path+'.txt', 'w') as f:
+            pstats.Stats(profile, stream=f).sort_stats('cumulative').print_stats(self.top)
+        exclude = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        before  = before.filter_traces(exclude)
+        after   = after.filter_traces(exclude)
+        with open(path+'.memory.txt', 'w') as f:
+            for diff in after.compare_to(before, 'traceback')[:self.top]:
+                f.write(str(diff)+'\n')
+                for line in diff.traceback.format():
+                    f.write(line+'\n')
+                f.write('\n')
+        print(datetime.datetime.now(), "  Profile written to "+path+".*")
+
+    # sampling
+
+    def start_sampling(self):
+        """
+        Sampling runs in its own thread and looks at all threads, the engine is only interrupted
+        for a moment at every sample.
+        """
+        if not self.claim():
+            return
+        print(datetime.datetime.now(), "  Sampling stacks for "+str(self.duration)+" seconds.")
+        threading.Thread(target=self.sample, name='profiler', daemon=True).start()
+
+    def sample(self):
+        stacks = collections.Counter()
+        names  = {}
+        own    = threading.get_ident()
+        end    = time.monotonic()+self.duration
+        try:
+            while time.monotonic() < end:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for ident,frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(code.co_name+' ('+os.path.basename(code.co_filename)+':'+str(code.co_firstlineno)+')')
+                        frame = frame.f_back
+                    stack.append(names.get(ident, str(ident)))
+                    stacks[';'.join(reversed(stack))] += 1
+                time.sleep(self.interval)
+            path = self.path('.stacks.txt')
+            with open(path, 'w') as f:
+                for stack,count in stacks.most_common():
+                    f.write(stack+' '+str(count)+'\n')
+            print(datetime.datetime.now(), "  Stack samples written to "+path)
+        except OSError as e:
+            print(datetime.datetime.now(), "  Could not write stack samples: "+str(e))
+        finally:
+            self.active = False
+
+
+####################################################################################################
@@ -0,0 +1,95 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Drift-free sampling schedule. Ticks are aligned to the wall clock (a 30 second period fires at :00
+and :30) but waited for with the monotonic clock, so the time spent reading and writing does not
+add to the period. The offset between wall clock and monotonic clock is re-synchronized when the
+wall clock jumps, e.g. when the Pi gets its time from NTP after booting.
+If a tick is overrun, the schedule either skips the ticks that already passed ('skip') or fires
+them late one after the other ('catchup'). Either way they are counted in missed.
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import math
+import time
+import asyncio
+
+
+####################################################################################################
+# Schedule
+####################################################################################################
+
+class AlignedSchedule:
+    """
+    Wall-clock aligned ticks every period seconds.
+    """
+
+    def __init__(self, period, policy='skip'):
+        if policy not in ('skip', 'catchup'):
+            raise ValueError("Unknown overrun policy "+str(policy)+". Use 'skip' or 'catchup'.")
+        self.period = period
+        self.policy = policy
+        self.missed = 0
+        self.align()
+
+    def align(self):
+        """
+        Synchronize to the wall clock and set the next tick to the next aligned time.
+        """
+        self.offset  = time.time()-time.monotonic()
+        self.next    = math.ceil((time.monotonic()+self.offset)/self.period)*self.period
+        self.counted = 0
+
+    def set_period(self, period):
+        """
+        Change the period. The next tick is the next multiple of the new period.
+        """
+        self.period  = period
+        self.next    = (math.floor(self.now()/period)+1)*period
+        self.counted = 0
+
+    def now(self):
+        """
+        Current wall-clock time as measured by the monotonic clock.
+        """
+        if abs(time.time()-time.monotonic()-self.offset) > 1:
+            self.align()
+        return time.monotonic()+self.offset
+
+    def advance(self, now):
+        """
+        Handle overrun ticks according to the policy and return the time of the next tick.
+        """
+        late = math.floor((now-self.next)/self.period)
+        if late > 0:
+            # with catchup the same overrun ticks are still late on the following calls, so only
+            # those after the last one already counted are added
+            last          = self.next+late*self.period
+            self.missed  += max(0, round((last-max(self.next, self.counted))/self.period))
+            self.counted  = last
+            if self.policy == 'skip':
+                self.next += late*self.period
+        tick       = self.next
+        self.next += self.period
+        return tick
+
+    async def wait(self):
+        """
+        Sleep until the next tick and return its wall-clock time in seconds since epoch.
+        """
+        now  = self.now()
+        tick = self.advance(now)
+        if tick > now:
+            await asyncio.sleep(tick-now)
+        return tick
+
+
+####################################################################################################
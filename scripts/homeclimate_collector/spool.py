@@ -0,0 +1,157 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Append-only on-disk spool for writes that could not be sent to influxdb, e.g. while the server
+reboots. Failed batches are appended to segment files and replayed in large batches once the
+database is reachable again.
+Every record is stored as a 4 byte length, a 4 byte crc32 checksum and the batch, which is the name
+of the database followed by the line protocol points, one per line.
+Appends only go to the page cache, segments are synced once when they are closed to keep the wear
+on the SD card low. If the spool grows beyond max_bytes, the oldest segments are dropped.
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import os
+import zlib
+import struct
+import datetime
+import threading
+
+
+####################################################################################################
+# Spool
+####################################################################################################
+
+header = struct.Struct('>II')       # payload length, crc32 of payload
+
+
+class Spool:
+    """
+    Segmented write-ahead spool in a directory.
+    """
+
+    def __init__(self, directory, segment_bytes=1000000, max_bytes=50000000, replay_batch=5000):
+        self.directory     = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes     = max_bytes
+        self.replay_batch  = replay_batch
+        self.lock          = threading.Lock()
+        self.file          = None
+        os.makedirs(directory, exist_ok=True)
+        segments      = self.segments()
+        self.sequence = int(segments[-1].split('.')[0])+1 if segments else 0
+
+    def segments(self):
+        """
+        Segment file names, oldest first.
+        """
+        return sorted(f for f in os.listdir(self.directory) if f.endswith('.spool'))
+
+    def pending(self):
+        """
+        True if there is spooled data waiting to be replayed.
+        """
+        with self.lock:
+            return self.file is not None or len(self.segments())>0
+
+    def append(self, data, database):
+        """
+        Append a batch of encoded points to the current segment.
+        """
+        payload = b'\n'.join([database.encode('utf-8')]+data)
+        with self.lock:
+            if self.file is None:
+                self.open_segment()
+            self.file.write(header.pack(len(payload), zlib.crc32(payload)))
+            self.file.write(payload)
+            self.file.flush()
+            if self.file.tell() >= self.segment_bytes:
+                self.close_segment()
+                self.evict()
+
+    def open_segment(self):
+        self.file      = open(os.path.join(self.directory, '%016d.spool' % self.sequence), 'ab')
+        self.sequence += 1
+
+    def close_segment(self):
+        if self.file is not None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+            self.file = None
+
+    def evict(self):
+        """
+        Drop the oldest segments until the spool fits into max_bytes.
+        """
+        segments = self.segments()
+        sizes    = [os.path.getsize(os.path.join(self.directory, s)) for s in segments]
+        total    = sum(sizes)
+        for segment,size in zip(segments, sizes):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, segment))
+            total -= size
+            print(datetime.datetime.now(), "  Spool exceeds "+str(self.max_bytes)+" bytes. Dropped oldest segment "+segment+".")
+
+    def read_segment(self, path):
+        """
+        Yield the database and points of the batches stored in a segment. Records with a wrong checksum are skipped, a truncated
+        record at the end of the segment is ignored.
+        """
+        with open(path, 'rb') as f:
+            content = f.read()
+        view   = memoryview(content)
+        offset = 0
+        while offset+header.size <= len(content):
+            length, crc = header.unpack_from(content, offset)
+            offset     += header.size
+            payload     = view[offset:offset+length]
+            offset     += length
+            if len(payload) < length:
+                print(datetime.datetime.now(), "  Truncated record in spool segment "+path+". Ignoring it.")
+                break
+            if zlib.crc32(payload) != crc:
+                print(datetime.datetime.now(), "  Corrupt record in spool segment "+path+". Skipping it.")
+                continue
+            lines = bytes(payload).split(b'\n')
+            yield lines[0].decode('utf-8'), lines[1:]
+
+    def replay(self, write):
+        """
+        Send spooled batches oldest first through write(data, database), which must return True on
+        success. Records of a segment are merged into batches of up to replay_batch points. A
+        segment is removed once all of it has been sent; replaying stops at the first failure and
+        is picked up again on the next call. Sending part of a segment twice is harmless because
+        influxdb overwrites points with identical series and timestamp.
+        """
+        with self.lock:
+            self.close_segment()
+            segments = self.segments()
+        for segment in segments:
+            path    = os.path.join(self.directory, segment)
+            batches = {}
+            for database,lines in self.read_segment(path):
+                points = batches.setdefault(database, [])
+                points.extend(lines)
+                if len(points) >= self.replay_batch:
+                    if not write(points, database):
+                        return False
+                    batches[database] = []
+            for database,points in batches.items():
+                if points and not write(points, database):
+                    return False
+            os.remove(path)
+            print(datetime.datetime.now(), "  Replayed spool segment "+segment+".")
+        return True
+
+
+####################################################################################################
@@ -0,0 +1,108 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Connections to a remote influxdb server. connect() creates a client whose HTTP connections are kept
+alive in a bounded pool, so that writes to the server do not pay for a new TCP connection each time
+and a slow server cannot make the collector open more and more connections. UDPSink sends line
+protocol to the UDP listener of influxdb instead, fire and forget, for high-rate data where losing a
+packet now and then is cheaper than waiting for every write. The UDP listener has to be enabled in
+influxdb.conf; it writes everything into the database configured there and interprets timestamps in
+its configured precision, which has to match the precision of the collector:
+    [[udp]]
+      enabled      = true
+      bind-address = ":8089"
+      database     = "homeclimate"
+      precision    = "s"
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import socket
+import datetime
+import requests
+from requests.adapters import HTTPAdapter
+from influxdb import InfluxDBClient
+
+
+####################################################################################################
+# HTTP
+####################################################################################################
+
+def connect(host='localhost', port=8086, username='root', password='root', database=None, pool_size=2, timeout=10, retries=3):
+    """
+    InfluxDBClient with a bounded pool of kept-alive connections. A request that finds all
+    pool_size connections busy waits for one instead of opening another. timeout applies to
+    connecting and to every read from the server, in seconds.
+    """
+    session = requests.Session()
+    client  = InfluxDBClient(host=host, port=port, username=username, password=password, database=database,
+                             timeout=timeout, retries=retries, session=session)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+    session.mount('http://', adapter)
+    return client
+
+
+####################################################################################################
+# UDP
+####################################################################################################
+
+class UDPSink:
+    """
+    Send encoded points to the UDP listener of influxdb, packed into datagrams of at most max_packet
+    bytes so that they are not fragmented. Used as sink of the polling engine for drivers with
+    'transport': 'udp'. The database is given by the listener and ignored here.
+    """
+
+    def __init__(self, host, port=8089, max_packet=1400):
+        self.address    = (host, port)
+        self.max_packet = max_packet
+        self.socket     = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_DGRAM)
+        self.packets    = 0
+        self.points     = 0
+        self.errors     = 0
+
+    def add(self, data, database=None):
+        packet = []
+        size   = 0
+        for line in data:
+            if packet and size+len(line)+1 > self.max_packet:
+                self.send(packet)
+                packet = []
+                size   = 0
+            packet.append(line)
+            size += len(line)+1
+        if packet:
+            self.send(packet)
+
+    def send(self, lines):
+        try:
+            self.socket.sendto(b'\n'.join(lines), self.address)
+            self.packets += 1
+            self.points  += len(lines)
+        except OSError as e:
+            if self.errors == 0:
+                print(datetime.datetime.now(), "  Sending data to database over UDP failed: "+str(e))
+            self.errors += 1
+
+    def stats(self):
+        """
+        Internal metrics of the UDP transport as influxdb point. The server does not acknowledge
+        anything, so these only count what was sent.
+        """
+        return [{'measurement': 'collector',
+                 'tags':        {'component': 'udp'},
+                 'fields':      {'sent_packets': self.packets, 'sent_points': self.points, 'send_errors': self.errors}
+                }]
+
+    def close(self):
+        self.socket.close()
+
+
+####################################################################################################
@@ -0,0 +1,89 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Range checks for readings that do not come from the sensor scripts, e.g. from remote nodes through
+the gateway. The limits are the ones the sensor scripts apply to their own readings, values outside
+of them are set to None just like the scripts do. Values are also converted to the type the scripts
+write for the field, because influxdb rejects a whole write if a field changes its type.
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import math
+
+
+####################################################################################################
+# Limits
+####################################################################################################
+
+# valid range per field, inclusive
+limits = {'temperature': (-20, 40),        # degC, dht22.py, bmp180.py
+          'humidity':    (0, 100),         # %, dht22.py
+          'pressure':    (900, 1100),      # hPa, bmp180.py
+         }
+
+# type per field as written by the sensor scripts
+types = {'temperature':  float,         # dht22.py, bmp180.py, co2monitor.py
+         'temperature2': int,           # mh-z19.py
+         'humidity':     int,           # dht22.py, rounded
+         'pressure':     int,           # bmp180.py, rounded
+         'co2':          int,           # co2monitor.py, mh-z19.py
+        }
+
+
+####################################################################################################
+# Validation
+####################################################################################################
+
+def valid_number(value):
+    """
+    Numbers that influxdb can store. bool is accepted as field value in its own right.
+    """
+    if isinstance(value, bool):
+        return True
+    if isinstance(value, int):
+        return True
+    return isinstance(value, float) and math.isfinite(value)
+
+
+def convert(value, kind):
+    if kind is int:
+        return int(round(value))
+    return kind(value)
+
+
+def validate(fields, limits=limits, types=types):
+    """
+    Returns a copy of the fields with values that are not numbers or out of range set to None and
+    the others converted to their type, and the number of values that were invalid.
+    """
+    checked = {}
+    invalid = 0
+    for key,value in fields.items():
+        if value is None:
+            checked[key] = None
+            continue
+        if not valid_number(value):
+            checked[key] = None
+            invalid     += 1
+            continue
+        if key in limits and not isinstance(value, bool):
+            lower,upper = limits[key]
+            if value < lower or value > upper:
+                checked[key] = None
+                invalid     += 1
+                continue
+        if key in types and not isinstance(value, bool):
+            value = convert(value, types[key])
+        checked[key] = value
+    return checked, invalid
+
+
+####################################################################################################
@@ -31,6 +31,97 @@ from homeclimate_statistics import plot_hist2d
 
 
 
+####################################################################################################
+# QUERY BUILDER # QUERY BUILDER # QUERY BUILDER # QUERY BUILDER # QUERY BUILDER # QUERY BUILDER #
+####################################################################################################
+
+# field and sensor of every plotted quantity in the hourly database
+sources = {'CO2':         {'field': 'mean_co2',         'tags': {'room': 'living room', 'sensor': 'USB CO2 monitor'}},
+           'temperature': {'field': 'mean_temperature', 'tags': {'room': 'living room', 'sensor': 'USB CO2 monitor'}},
+           'brightness':  {'field': 'mean_lux',         'tags': {'room': 'living room', 'sensor': 'TSL2561'}},
+           'humidity':    {'field': 'mean_humidity',    'tags': {'room': 'pin17',       'sensor': 'DHT22'}},
+           'pressure':    {'field': 'mean_pressure',    'tags': {'room': 'outdoor',     'sensor': 'BMP180'}}
+          }
+
+def quote_identifier(name):
+    return '"'+name.replace('\\', '\\\\').replace('"', '\\"')+'"'
+
+def quote_string(value):
+    return "'"+value.replace('\\', '\\\\').replace("'", "\\'")+"'"
+
+def build_queries(time_range, sources=sources, measurement='live logging', interval='1h'):
+    """
+    One statement per sensor that selects only the fields of the quantities it provides, restricted
+    to the time range and averaged per interval by influxdb. Returns the statements joined into a
+    single request and the quantities each statement returns, in the same order.
+    """
+    sensors = {}
+    for quantity,source in sources.items():
+        sensors.setdefault(tuple(sorted(source['tags'].items())), []).append(quantity)
+    statements = []
+    for tags,quantities in sensors.items():
+        fields     = ', '.join('mean('+quote_identifier(sources[q]['field'])+') AS '+quote_identifier(q) for q in quantities)
+        conditions = ' AND '.join([quote_identifier(k)+' = '+quote_string(v) for k,v in tags]+['time > now() - '+time_range])
+        statements.append('SELECT '+fields+' FROM '+quote_identifier(measurement)+' WHERE '+conditions+' GROUP BY time('+interval+') fill(none)')
+    return '; '.join(statements), list(sensors.values())
+
+def query_values(client, time_range, sources=sources):
+    """
+    Values of all quantities within the time range, fetched with a single request.
+    """
+    return {name: list(values) for name,(times,values) in query_series(client, time_range, sources).items()}
+
+# length of influxdb durations in seconds
+units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+def duration(time_range):
+    return int(time_range[:-1])*units[time_range[-1]]
+
+def query_series(client, time_range, sources=sources):
+    """
+    Time series of all quantities within the time range, fetched with a single request. Every
+    quantity is returned as a pair of arrays, time in seconds since epoch and value, sorted by time.
+    """
+    query, quantities = build_queries(time_range, sources)
+    results = client.query(query, epoch='s')
+    if not isinstance(results, list):
+        results = [results]
+    series = {}
+    for result,names in zip(results, quantities):
+        points = list(result.get_points())
+        for name in names:
+            valid  = [x for x in points if not x[name]==None]
+            times  = np.array([x['time'] for x in valid], dtype=np.int64)
+            values = np.array([x[name] for x in valid], dtype=float)
+            order  = np.argsort(times, kind='stable')
+            series[name] = (times[order], values[order])
+    return series
+
+def window(series, time_range, now):
+    """
+    The part of the series within the time range before now. Binary search on the sorted times,
+    the returned arrays are views into the series and do not copy the data.
+    """
+    start  = now-duration(time_range)
+    sliced = {}
+    for name,(times,values) in series.items():
+        first        = np.searchsorted(times, start, side='right')
+        sliced[name] = (times[first:], values[first:])
+    return sliced
+
+def query_ranges(client, ranges, sources=sources):
+    """
+    Values of all quantities for every range given as {name: {'range': '30d', ...}}. Only the
+    widest range is fetched, the others are sliced from it. Returns the values per range and the
+    full series.
+    """
+    now    = datetime.now().timestamp()
+    widest = max([r['range'] for r in ranges.values()], key=duration)
+    series = query_series(client, widest, sources)
+    values = {name: {k: v for k,(t,v) in window(series, r['range'], now).items()} for name,r in ranges.items()}
+    return values, series
+
+
 ####################################################################################################
 # STATISTICS CLASS # STATISTICS CLASS # STATISTICS CLASS # STATISTICS CLASS # STATISTICS CLASS #
 ####################################################################################################
@@ -61,18 +152,11 @@ class homeclimate_statistics:
     def connect_influx():
         self.client = InfluxDBClient(host='localhost', port=8086, username='root', password='root', database='homeclimate_hourly')
 
-    def get_values(time_range):
-        results = client.query('SELECT * FROM "live logging" WHERE time > now() - '+time_range)
-        USBmonitor = list(results.get_points('live logging', tags={'room':'living room', 'sensor':'USB CO2 monitor'}))
-        TSL2561    = list(results.get_points('live logging', tags={'room':'living room', 'sensor':'TSL2561'}))
-        DHT22      = list(results.get_points('live logging', tags={'room':'pin17',       'sensor':'DHT22'}))
-        BMP180     = list(results.get_points('live logging', tags={'room':'outdoor',     'sensor':'BMP180'}))
-        values = {'CO2':         [x['mean_co2'] for x in USBmonitor if not x['mean_co2']==None],
-                  'temperature': [x['mean_temperature'] for x in USBmonitor if not x['mean_temperature']==None],
-                  'brightness':  [x['mean_lux'] for x in TSL2561 if not x['mean_lux']==None],
-                  'humidity':    [x['mean_humidity'] for x in DHT22 if not x['mean_humidity']==None],
-                  'pressure':    [x['mean_pressure'] for x in BMP180 if not x['mean_pressure']==None]}
-        return time_range, values
+    def get_values(self, time_range):
+        return time_range, query_values(self.client, time_range)
+
+    def get_ranges(self):
+        return query_ranges(self.client, self.ranges)
 
 
 
@@ -95,17 +179,7 @@ client = InfluxDBClient(host='localhost', port=8086, username='root', password='
 ####################################################################################################
 
 def get_values(time_range):
-    results = client.query('SELECT * FROM "live logging" WHERE time > now() - '+time_range)
-    USBmonitor = list(results.get_points('live logging', tags={'room':'living room', 'sensor':'USB CO2 monitor'}))
-    TSL2561    = list(results.get_points('live logging', tags={'room':'living room', 'sensor':'TSL2561'}))
-    DHT22      = list(results.get_points('live logging', tags={'room':'pin17',       'sensor':'DHT22'}))
-    BMP180     = list(results.get_points('live logging', tags={'room':'outdoor',     'sensor':'BMP180'}))
-    values = {'CO2':         [x['mean_co2'] for x in USBmonitor if not x['mean_co2']==None],
-              'temperature': [x['mean_temperature'] for x in USBmonitor if not x['mean_temperature']==None],
-              'brightness':  [x['mean_lux'] for x in TSL2561 if not x['mean_lux']==None],
-              'humidity':    [x['mean_humidity'] for x in DHT22 if not x['mean_humidity']==None],
-              'pressure':    [x['mean_pressure'] for x in BMP180 if not x['mean_pressure']==None]}
-    return time_range, values
+    return time_range, query_values(client, time_range)
 
 
 ####################################################################################################
@@ -133,8 +207,9 @@ ranges = {'total': {'range': '1000d', 'alpha': 1.00},
           'day':   {'range': '1d',    'alpha': 0.25},
          }
 
-# query influxdb and get measurements
-values = {r: get_values(v['range']) for r,v in ranges.items()}
+# query influxdb once for the widest range and slice the others from it
+values, series = query_ranges(client, ranges)
+now            = datetime.now().timestamp()
 
 # histgram data
 bins = {k: np.arange(v['min'],v['max']+v['step'],v['step']) for k,v in hsetup.items()}
@@ -192,19 +267,15 @@ except:
     # write either log or timestamp file
     # parse through datetime if necessary
 
-# load new time series data since last statistics run
-results = client.query('SELECT * FROM "live logging" WHERE time > now() - 1d')
-USBmonitor = list(results.get_points('live logging', tags={'room':'living room', 'sensor':'USB CO2 monitor'}))
-TSL2561    = list(results.get_points('live logging', tags={'room':'living room', 'sensor':'TSL2561'}))
-DHT22      = list(results.get_points('live logging', tags={'room':'pin17',       'sensor':'DHT22'}))
-BMP180     = list(results.get_points('live logging', tags={'room':'outdoor',     'sensor':'BMP180'}))
+# new time series data since last statistics run, sliced from the data queried above
+day = window(series, '1d', now)
 
 # bring new data into readable format
-quantities = {'co2':         [[x['time'],x['mean_co2']] for x in USBmonitor],
-              'temperature': [[x['time'],x['mean_temperature']] for x in USBmonitor],
-              'brightness':  [[x['time'],x['mean_lux']] for x in TSL2561],
-              'humidity':    [[x['time'],x['mean_humidity']] for x in DHT22],
-              'pressure':    [[x['time'],x['mean_pressure']] for x in BMP180]}
+quantities = {'co2':         list(zip(*day['CO2'])),
+              'temperature': list(zip(*day['temperature'])),
+              'brightness':  list(zip(*day['brightness'])),
+              'humidity':    list(zip(*day['humidity'])),
+              'pressure':    list(zip(*day['pressure']))}
 
 
 ####################################################################################################
@@ -214,7 +285,7 @@ quantities = {'co2':         [[x['time'],x['mean_co2']] for x in USBmonitor],
 # mean value per hour of the day
 for key,quantity in quantities.items():
     for time,value in quantity:
-        hour  = datetime.strptime(time, '%Y-%m-%dT%H:%M:%SZ').hour
+        hour  = datetime.utcfromtimestamp(time).hour
         hour_mean[key][hour]['#']    += 1
         hour_mean[key][hour]['mean'] += value/hour_mean[key][hour]['#']
 
@@ -27,6 +27,9 @@ ip   = '0.0.0.0'        # change to IP of your smart plug
 port = 9999             # default port for HS110
 sample_time = 30        # seconds
 
+# commands sent in a single request: realtime power data and general plug info
+command = '{"emeter":{"get_realtime":{}},"system":{"get_sysinfo":{}}}'
+
 
 ####################################################################################################
 # Initialize connection to influxdb
@@ -35,71 +38,139 @@ sample_time = 30        # seconds
 # if influxdb server is up and accessible
 # TDB: test connection
 
-client = InfluxDBClient(host='0.0.0.0', port=8086, username='root', password='root', database='telegraf')
+# The collector imports this script as a driver and writes through its own client, so the
+# client is only created when the script runs standalone.
+
+if __name__ == '__main__':
+    client = InfluxDBClient(host='0.0.0.0', port=8086, username='root', password='root', database='telegraf')
 
 
 ####################################################################################################
 # Read data
 ####################################################################################################
 
+def encrypt_bytes(data):
+    """
+    Encrypt the TP-Link Smart Home Protocoll: XOR Autokey Cipher with starting key = 171
+    Every ciphertext byte is the XOR of the key and all plaintext bytes up to it. This cumulative
+    XOR is computed on the whole buffer at once as one big integer: XORing it with copies of itself
+    shifted by 1, 2, 4, ... bytes adds up all preceding bytes in log2(n) steps.
+    Works on bytes, bytearray or memoryview and returns the ciphertext without length prefix.
+    """
+    n = len(data)
+    if n == 0:
+        return b''
+    x     = (171 << 8*n) | int.from_bytes(data, 'big')
+    shift = 8
+    while shift <= 8*n:
+        x     ^= x >> shift
+        shift *= 2
+    return x.to_bytes(n+1, 'big')[1:]
+
+def decrypt_bytes(data):
+    """
+    Decrypt the TP-Link Smart Home Protocoll: XOR Autokey Cipher with starting key = 171
+    Every plaintext byte only depends on the ciphertext byte before it, so the whole buffer is
+    decrypted by a single XOR with itself shifted by one byte.
+    Works on bytes, bytearray or memoryview and returns bytes.
+    """
+    n = len(data)
+    if n == 0:
+        return b''
+    x = int.from_bytes(data, 'big')
+    return (x ^ ((171 << 8*(n-1)) | (x >> 8))).to_bytes(n, 'big')
+
 def encrypt(string):
     """
     Encrypt the TP-Link Smart Home Protocoll: XOR Autokey Cipher with starting key = 171
     This follows: https://github.com/softScheck/tplink-smartplug
+    Returns the ciphertext with the 4 byte length prefix the plug expects.
     """
     from struct import pack
-    key = 171
-    result = pack('>I', len(string))
-    for i in string:
-        a = key ^ ord(i)
-        key = a
-        result += bytes([a])
-    return result
+    if isinstance(string, str):
+        string = string.encode('latin-1')
+    return pack('>I', len(string)) + encrypt_bytes(string)
 
 def decrypt(string):
     """
     Decrypt the TP-Link Smart Home Protocoll: XOR Autokey Cipher with starting key = 171
     This follows: https://github.com/softScheck/tplink-smartplug
     """
-    key = 171
-    result = ""
-    for i in string:
-        a = key ^ i
-        key = i
-        result += chr(a)
-    return result
+    return decrypt_bytes(string).decode('latin-1')
 
-def poll_HS110(ip,port):
+def recv_frame(sock, max_length=1000000):
+    """
+    Receive a complete response. The plug prefixes every response with its length as 4 byte
+    integer, the response is read into a buffer of exactly that size until it is complete.
+    Returns the response including the length prefix.
+    """
+    from struct import unpack
+    prefix = bytearray(4)
+    view   = memoryview(prefix)
+    got    = 0
+    while got < 4:
+        n = sock.recv_into(view[got:])
+        if n == 0:
+            raise ConnectionError("HS110 closed the connection.")
+        got += n
+    length = unpack('>I', prefix)[0]
+    if length > max_length:
+        raise ConnectionError("HS110 response of "+str(length)+" bytes is too large.")
+    frame     = bytearray(4+length)
+    frame[:4] = prefix
+    view      = memoryview(frame)
+    while got < 4+length:
+        n = sock.recv_into(view[got:])
+        if n == 0:
+            raise ConnectionError("HS110 closed the connection.")
+        got += n
+    return frame
+
+def poll_HS110(ip,port,command=command):
     """
     connect to HS110, send payload and receive power data
+    command may hold several queries in one request, e.g. emeter and system info.
     """
     import socket
     try:
         sock_tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         sock_tcp.settimeout(int(10))
         sock_tcp.connect((ip, port))
-        sock_tcp.settimeout(None)
-        sock_tcp.send(encrypt('{"emeter":{"get_realtime":{}}}'))
-        data = sock_tcp.recv(2048)
+        sock_tcp.sendall(encrypt(command))
+        data = recv_frame(sock_tcp)
         sock_tcp.close()
         return data
     except:
         raise ConnectionError("Could not connect to HS110 at IP "+str(ip)+" on port "+str(port))
 
+def decrypt_json(data):
+    """
+    decrypt a response including its length prefix and parse the json it contains
+    """
+    import json
+    return json.loads(decrypt_bytes(memoryview(data)[4:]))
+
 def decrypt_power(data):
     """
     decrypt power data and convert to Volts, Ampere, Watt, kWh
+    If the response also contains the system info, relay state, signal strength and on time are
+    added.
     """
-    import json
     try:
-        decrypted = decrypt(data[4:])
-        decrypt_dict = json.loads(decrypted)
-        return {'voltage':      decrypt_dict['emeter']['get_realtime']['voltage_mv']/1000,    # V
-                'current':      decrypt_dict['emeter']['get_realtime']['current_ma']/1000,    # A
-                'power':        decrypt_dict['emeter']['get_realtime']['power_mw']/1000,      # W
-                'energy_total': decrypt_dict['emeter']['get_realtime']['total_wh']/1000,      # kWh
-                'error_code':   decrypt_dict['emeter']['get_realtime']['err_code']
-               }
+        decrypt_dict = decrypt_json(data)
+        power = {'voltage':      decrypt_dict['emeter']['get_realtime']['voltage_mv']/1000,    # V
+                 'current':      decrypt_dict['emeter']['get_realtime']['current_ma']/1000,    # A
+                 'power':        decrypt_dict['emeter']['get_realtime']['power_mw']/1000,      # W
+                 'energy_total': decrypt_dict['emeter']['get_realtime']['total_wh']/1000,      # kWh
+                 'error_code':   decrypt_dict['emeter']['get_realtime']['err_code']
+                }
+        if 'system' in decrypt_dict:
+            sysinfo = decrypt_dict['system']['get_sysinfo']
+            power.update({'relay_state': sysinfo.get('relay_state'),
+                          'rssi':        sysinfo.get('rssi'),                           # dBm
+                          'on_time':     sysinfo.get('on_time')                         # s
+                         })
+        return power
     except:
         raise TypeError("Could not decrypt returned data.")
 
@@ -114,16 +185,13 @@ def read_sensor():
         data = decrypt_power(data)
     except ConnectionError:
         print(polltime, "  Error contacting HS110. Passing dummy data.")
-        voltage, current, power, energy_total = None, None, None, None
-        error_code = 9999
+        data = {'voltage': None, 'current': None, 'power': None, 'energy_total': None, 'error_code': 9999}
     except TypeError:
         print(polltime, "  Error decrypting data. Passing dummy data.")
-        voltage, current, power, energy_total = None, None, None, None
-        error_code = 9999
+        data = {'voltage': None, 'current': None, 'power': None, 'energy_total': None, 'error_code': 9999}
     except Exception:
         print(polltime, "  Unknown error. Passing dummy data.")
-        voltage, current, power, energy_total = None, None, None, None
-        error_code = 9999                                                           # I assume such a high error code 9999 is not used by TP-Link, so I highjack this metric.
+        data = {'voltage': None, 'current': None, 'power': None, 'energy_total': None, 'error_code': 9999}    # I assume such a high error code 9999 is not used by TP-Link, so I highjack this metric.
 
     return [{'measurement': 'power',
              'tags': {'sensor': 'HS110'},
@@ -158,17 +226,19 @@ def write_database(client, data):
 # Continuously take data
 ####################################################################################################
 
-try:
-    while True:
+if __name__ == '__main__':
+
+    try:
+        while True:
 
-        write_database(client = client,
-                       data   = read_sensor()
-                      )
+            write_database(client = client,
+                           data   = read_sensor()
+                          )
 
-        time.sleep(sample_time)
+            time.sleep(sample_time)
 
-except KeyboardInterrupt:
-    print (datetime.datetime.now(), "  Program stopped by keyboard interrupt [CTRL_C] by user. ")
+    except KeyboardInterrupt:
+        print (datetime.datetime.now(), "  Program stopped by keyboard interrupt [CTRL_C] by user. ")
 
 
 ####################################################################################################
@@ -0,0 +1,160 @@
+"""
+Home Climate Monitoring
+
+author: GiantMolecularCloud
+
+This script is part of a collection of scripts to log climate information in python and send them
+to influxdb and graphana for plotting.
+
+Backfill the energy statistics stored on a TP-Link HS110 smart plug into the 'power' measurement.
+The plug keeps the energy used per day and per month. This fills holes in the power data, e.g. when
+the collector was not running, with the daily and monthly totals:
+    python3 hs110_backfill.py 2021-01-01 2021-12-31 --ip 192.168.0.10
+Every statistic is written at local midnight of its day (or first day of its month) with a 'stat'
+tag, and statistics that already exist in the database are skipped. Running the backfill twice
+therefore does not duplicate points.
+"""
+
+####################################################################################################
+# Import modules
+####################################################################################################
+
+import sys
+import json
+import time
+import datetime
+import argparse
+from influxdb import InfluxDBClient
+
+import hs110
+from homeclimate_collector.points import Encoder
+from homeclimate_collector.database import write_lines
+
+
+####################################################################################################
+# Backfill Definition
+####################################################################################################
+
+batch_size = 5000       # points per write
+
+
+####################################################################################################
+# Read statistics
+####################################################################################################
+
+def energy(entry):
+    """
+    Energy of a statistics entry in kWh. Hardware version 1 reports kWh, version 2 Wh.
+    """
+    if 'energy_wh' in entry:
+        return entry['energy_wh']/1000
+    return entry['energy']
+
+def months(start, end):
+    """
+    All (year, month) in the date range.
+    """
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        yield year, month
+        year, month = (year+1, 1) if month==12 else (year, month+1)
+
+def read_daystat(ip, port, start, end):
+    """
+    Energy per day as list of (date, kWh) for all days in the date range.
+    """
+    days = []
+    for year, month in months(start, end):
+        command  = json.dumps({'emeter': {'get_daystat': {'month': month, 'year': year}}})
+        response = hs110.decrypt_json(hs110.poll_HS110(ip, port, command=command))
+        for entry in response['emeter']['get_daystat'].get('day_list', []):
+            day = datetime.date(entry['year'], entry['month'], entry['day'])
+            if start <= day <= end:
+                days.append((day, energy(entry)))
+    return days
+
+def read_monthstat(ip, port, start, end):
+    """
+    Energy per month as list of (date of the first day, kWh) for all months in the date range.
+    """
+    result = []
+    for year in range(start.year, end.year+1):
+        command  = json.dumps({'emeter': {'get_monthstat': {'year': year}}})
+        response = hs110.decrypt_json(hs110.poll_HS110(ip, port, command=command))
+        for entry in response['emeter']['get_monthstat'].get('month_list', []):
+            month = datetime.date(entry['year'], entry['month'], 1)
+            if (start.year, start.month) <= (month.year, month.month) <= (end.year, end.month):
+                result.append((month, energy(entry)))
+    return result
+
+
+####################################################################################################
+# Write statistics
+####################################################################################################
+
+def midnight(day):
+    """
+    Local midnight of a date in seconds since epoch. The plug counts days in local time.
+    """
+    return int(time.mktime(day.timetuple()))
+
+def existing(client, database, plug, stat, start, end):
+    """
+    Timestamps of statistics that are already in the database.
+    """
+    query   = ('SELECT "energy" FROM "power" WHERE "sensor"=\'HS110\' AND "plug"=\'{}\' AND "stat"=\'{}\' '
+               'AND time >= {}s AND time <= {}s').format(plug, stat, midnight(start), midnight(end))
+    results = client.query(query, database=database, epoch='s')
+    return set(p['time'] for p in results.get_points('power'))
+
+def backfill(client, database, plug, stat, entries, start, end):
+    """
+    Write all entries that are not in the database yet in batches. Returns the number of points
+    written.
+    """
+    skip    = existing(client, database, plug, stat, start, end)
+    encoder = Encoder('s')
+    lines   = []
+    for day, kwh in entries:
+        timestamp = midnight(day)
+        if timestamp in skip:
+            continue
+        lines += encoder.encode([{'measurement': 'power',
+                                  'tags': {'sensor': 'HS110', 'plug': plug, 'stat': stat},
+                                  'fields': {'energy': float(kwh)}
+                                 }], timestamp)
+    for i in range(0, len(lines), batch_size):
+        if not write_lines(client, lines[i:i+batch_size], database, precision='s'):
+            sys.exit("Backfill aborted, could not write to database.")
+    return len(lines)
+
+
+####################################################################################################
+# Run backfill
+####################################################################################################
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Backfill daily and monthly energy statistics of a HS110 smart plug.')
+    parser.add_argument('start', type=datetime.date.fromisoformat, help='first day, YYYY-MM-DD')
+    parser.add_argument('end',   type=datetime.date.fromisoformat, help='last day, YYYY-MM-DD')
+    parser.add_argument('--ip',       default=hs110.ip,   help='IP of the smart plug')
+    parser.add_argument('--port',     default=hs110.port, type=int)
+    parser.add_argument('--plug',     default='hs110',    help='plug tag of the backfilled statistics')
+    parser.add_argument('--host',     default='0.0.0.0',  help='influxdb host')
+    parser.add_argument('--database', default='telegraf')
+    args = parser.parse_args()
+
+    client = InfluxDBClient(host=args.host, port=8086, username='root', password='root', database=args.database)
+
+    days   = read_daystat(args.ip, args.port, args.start, args.end)
+    n_days = backfill(client, args.database, args.plug, 'day', days, args.start, args.end)
+    print(datetime.datetime.now(), "  Wrote "+str(n_days)+" of "+str(len(days))+" daily statistics.")
+
+    month_list = read_monthstat(args.ip, args.port, args.start, args.end)
+    first      = args.start.replace(day=1)
+    n_months   = backfill(client, args.database, args.plug, 'month', month_list, first, args.end)
+    print(datetime.datetime.now(), "  Wrote "+str(n_months)+" of "+str(len(month_list))+" monthly statistics.")
+
+
+####################################################################################################